@@ -0,0 +1,223 @@
+# WSAA-project: Web Services and Applications.
+# Optional async (ASGI) application serving the same API as serverA.PY.
+# Author: Laura Lyons
+#
+# Run with:  hypercorn asgi_server:app --bind 127.0.0.1:5000
+#       or:  python asgi_server.py
+
+import asyncio
+import logging
+
+import httpx
+from quart import Quart, request, jsonify, render_template, make_response
+
+import car_park_service as service
+import feedconfig as cfg
+import http_cache
+from dao.connection_pool import get_pool
+from dao.read_cache import read_cache
+from live_feed import live_feed, live_feed_params, parse_live_records
+
+logging.basicConfig(level=logging.ERROR)
+
+app = Quart(__name__, static_folder='static')
+http_cache.init_async_app(app)
+
+# The event loop polls the council API itself, so the feed cache must not
+# start its own thread or fetch on behalf of a request.
+live_feed.external_refresh = True
+
+
+async def call_dao(func, *args):
+    """
+    Runs blocking business logic on a worker thread.
+
+    Database calls check a connection out of the shared, bounded pool, so the
+    event loop keeps serving other clients while MySQL responds.
+    """
+    return await asyncio.to_thread(func, *args)
+
+
+async def refresh_live_feed(client):
+    """ Fetches one snapshot from the council API without blocking the loop. """
+    try:
+        response = await client.get(cfg.live_feed["api_url"], params=live_feed_params())
+        response.raise_for_status()
+        live_feed.store(parse_live_records(response.json()))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:  # Any failure keeps the previous snapshot; polling carries on
+        live_feed.record_error(e)
+
+
+async def poll_live_feed(client):
+    """ Background task: refreshes the live feed every refresh_interval seconds. """
+    while True:
+        await asyncio.sleep(live_feed.refresh_interval)
+        try:
+            await refresh_live_feed(client)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # Never let one bad poll end the task
+            live_feed.record_error(e)
+
+
+@app.before_serving
+async def startup():
+    """ Opens the HTTP client, loads the first snapshot, warms the read cache and starts recording history """
+    app.http_client = httpx.AsyncClient(timeout=cfg.live_feed.get("timeout", 10))
+    await asyncio.gather(
+        refresh_live_feed(app.http_client),
+        call_dao(service.warm_read_cache),
+        call_dao(service.start_occupancy_recorder)
+    )
+    app.poll_task = asyncio.create_task(poll_live_feed(app.http_client))
+
+
+@app.after_serving
+async def shutdown():
+    """ Stops polling and releases the HTTP client and idle DB connections """
+    app.poll_task.cancel()
+    await app.http_client.aclose()
+    await call_dao(service.occupancy_recorder.stop)
+    get_pool().close()
+
+
+# Root endpoint
+@app.route('/')
+async def index():
+    """ Render the index page """
+    return await render_template('parking_checker2.html')
+
+# Cache and pool statistics
+@app.route('/api/live-feed/stats', methods=['GET'])
+async def get_live_feed_stats():
+    """ Report snapshot age and hit/miss counters for the live feed cache """
+    return jsonify(live_feed.stats())
+
+@app.route('/api/db-pool/stats', methods=['GET'])
+async def get_db_pool_stats():
+    """ Report pool size, usage and wait metrics """
+    return jsonify(get_pool().stats())
+
+@app.route('/api/read-cache/stats', methods=['GET'])
+async def get_read_cache_stats():
+    """ Report hit/miss/eviction counters for the opening hours and car park cache """
+    return jsonify(read_cache.stats())
+
+@app.route('/api/car-park-view/stats', methods=['GET'])
+async def get_car_park_view_stats():
+    """ Report hit/rebuild counters for the pre-built car parks + live availability view """
+    return jsonify(service.car_park_view.stats())
+
+@app.route('/api/occupancy-recorder/stats', methods=['GET'])
+async def get_occupancy_recorder_stats():
+    """ Report recorded samples, batched flushes and buffered rows """
+    return jsonify(service.occupancy_recorder.stats())
+
+# Fetch all car parks from MySQL and match with live data
+@app.route('/api/car-parks', methods=['GET'])
+async def get_car_parks():
+    """ Fetch all car parks from MySQL and match with live data """
+    body, status, headers = await call_dao(service.list_car_parks)
+    return app.response_class(body, status=status, headers=headers, mimetype="application/json")
+
+# Stream changes in free spaces as server-sent events
+@app.route('/api/car-parks/stream', methods=['GET'])
+async def stream_car_park_availability():
+    """ Push only the car parks whose free spaces changed since the last refresh """
+    broadcaster = service.availability_broadcaster
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+    async def generate():
+        seq, messages = broadcaster.stream(last_event_id)
+        yield "retry: 5000\n\n"
+        for message in messages:
+            yield message
+        while True:
+            events = await broadcaster.wait_for_events_async(seq, timeout=service.STREAM_KEEPALIVE)
+            if events:
+                seq, messages = broadcaster.format_events(events, seq)
+                for message in messages:
+                    yield message
+            else:
+                yield ": keep-alive\n\n"  # Stops proxies closing an idle connection
+
+    response = await make_response(generate(), {"Content-Type": "text/event-stream",
+                                                "Cache-Control": "no-cache",
+                                                "X-Accel-Buffering": "no"})
+    response.timeout = None  # Streams stay open for as long as the browser is connected
+    return response
+
+# Fetch live parking spaces for selected car park (in-memory lookup, no I/O)
+@app.route('/api/car-parks/<int:car_park_id>', methods=['GET'])
+async def get_car_park_availability(car_park_id):
+    """ Fetch live parking spaces for a specific car park """
+    body, status = service.car_park_availability(car_park_id)
+    return jsonify(body), status
+
+# Fetch opening hours for selected car park
+@app.route('/api/opening-hours/<int:car_park_id>', methods=['GET'])
+async def get_opening_hours(car_park_id):
+    """ Fetch opening hours for a specific car park """
+    body, status = await call_dao(service.opening_hours_today, car_park_id)
+    return jsonify(body), status
+
+# Fetch height restriction for selected car park
+@app.route('/api/height-restriction/<int:car_park_id>', methods=['GET'])
+async def get_height_restriction(car_park_id):
+    """ Fetch height restrictions for a specific car park """
+    body, status = await call_dao(service.height_restriction, car_park_id)
+    return jsonify(body), status
+
+# Add a car park
+@app.route('/api/add-car-park', methods=['POST'])
+async def add_car_park():
+    """ Adds a car park with its weekly opening hours """
+    data = await request.get_json()
+    body, status = await call_dao(service.add_car_park, data)
+    return jsonify(body), status
+
+# Add opening hours
+@app.route('/api/add-opening-hours', methods=['POST'])
+async def add_opening_hours():
+    """ Adds opening hours for a car park """
+    data = await request.get_json()
+    body, status = await call_dao(service.add_opening_hours, data)
+    return jsonify(body), status
+
+# Delete a car park
+@app.route('/delete_car_park', methods=['POST'])
+async def delete_car_park():
+    """ Deletes a car park and its associated opening hours """
+    form = await request.form
+    body, status = await call_dao(service.delete_car_park, form.get('car_park_id'))
+    return jsonify(body), status
+
+# Get a car park by id with its opening hours for each day
+@app.route('/api/car-parks/<int:car_park_id>/details', methods=['GET'])
+async def get_car_park(car_park_id):
+    """ Fetch a specific car park by ID """
+    body, status = await call_dao(service.car_park_details, car_park_id)
+    return jsonify(body), status
+
+# Occupancy history for a car park
+@app.route('/api/car-parks/<int:car_park_id>/history', methods=['GET'])
+async def get_occupancy_history(car_park_id):
+    """ Min/avg/max free spaces per time bucket for a specific car park """
+    body, status = await call_dao(service.occupancy_history, car_park_id, request.args)
+    return jsonify(body), status
+
+# Update a car park
+@app.route('/update_car_park', methods=['POST'])
+async def update_car_park():
+    """ Updates the height restriction and opening hours of a car park """
+    data = await request.get_json()
+    body, status = await call_dao(service.update_car_park, data)
+    return jsonify(body), status
+
+
+# Start ASGI server
+if __name__ == "__main__":
+    print("Starting ASGI server on http://127.0.0.1:5000")
+    app.run(host="127.0.0.1", port=5000)
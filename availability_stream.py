@@ -0,0 +1,127 @@
+# WSAA-project: Web Services and Applications.
+# Broadcasts changes in live free spaces to browsers as server-sent events.
+# Author: Laura Lyons
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+
+def format_sse(data, event=None, event_id=None):
+    """ Formats one server-sent event. """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class AvailabilityBroadcaster:
+    """
+    Turns live feed refreshes into "only what changed" events.
+
+    After each refresh the free spaces are compared with the previous
+    snapshot; car parks whose value changed (or that dropped out of the feed,
+    sent as null) become one event in a bounded history. Event IDs look like "<epoch>:<seq>" so a client reconnecting with
+    Last-Event-ID can be sent exactly the events it missed, or a full snapshot
+    if the server restarted or the events have already been discarded.
+    """
+    def __init__(self, feed, history_size=256):
+        self.epoch = str(int(time.time()))
+        self._seq = 0
+        self._spaces = {}
+        self._events = deque(maxlen=history_size)
+        self._cond = threading.Condition()
+        self._async_waiters = set()
+        self._lock = threading.Lock()
+        feed.add_listener(self.publish)
+
+    def publish(self, records):
+        """ Feed listener: records one event containing only the changed car parks. """
+        spaces = {str(item.get("id")): item.get("free_spaces") for item in records}
+        with self._cond:
+            changes = {park_id: free for park_id, free in spaces.items()
+                       if park_id not in self._spaces or self._spaces[park_id] != free}
+            # Car parks that dropped out of the feed are sent as null (no live data)
+            changes.update({park_id: None for park_id in self._spaces if park_id not in spaces})
+            self._spaces = spaces
+            if not changes:
+                return
+            self._seq += 1
+            self._events.append((self._seq, changes))
+            self._cond.notify_all()
+
+        with self._lock:
+            waiters, self._async_waiters = self._async_waiters, set()
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def event_id(self, seq):
+        """ Public event ID for a sequence number. """
+        return f"{self.epoch}:{seq}"
+
+    def snapshot(self):
+        """ Returns (seq, free spaces of every car park) for a newly connected client. """
+        with self._cond:
+            return self._seq, dict(self._spaces)
+
+    def resume_point(self, last_event_id):
+        """
+        Returns the sequence number to resume after, or None if the client
+        must be sent a full snapshot instead.
+        """
+        try:
+            epoch, seq = (last_event_id or "").split(":")
+            seq = int(seq)
+        except ValueError:
+            return None
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if epoch != self.epoch or seq > self._seq or seq < oldest - 1:
+                return None
+        return seq
+
+    def events_since(self, seq):
+        """ Returns the (seq, changes) events published after seq. """
+        with self._cond:
+            return [event for event in self._events if event[0] > seq]
+
+    def wait_for_events(self, seq, timeout):
+        """ Blocks until there are events after seq (or the timeout expires). """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > seq, timeout)
+        return self.events_since(seq)
+
+    async def wait_for_events_async(self, seq, timeout):
+        """ Awaits events after seq without blocking the event loop. """
+        if self._seq <= seq:
+            waiter = (asyncio.get_running_loop(), asyncio.Event())
+            with self._lock:
+                self._async_waiters.add(waiter)
+            try:
+                if self._seq <= seq:  # Re-check: a publish may have just happened
+                    await asyncio.wait_for(waiter[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    self._async_waiters.discard(waiter)
+        return self.events_since(seq)
+
+    def stream(self, last_event_id=None):
+        """ Initial events for a client: the missed deltas, or a full snapshot. """
+        seq = self.resume_point(last_event_id)
+        if seq is None:
+            seq, spaces = self.snapshot()
+            return seq, [format_sse(spaces, "snapshot", self.event_id(seq))]
+        return self.format_events(self.events_since(seq), seq)
+
+    def format_events(self, events, seq=None):
+        """ Formats (seq, changes) events; returns (last seq, messages). """
+        messages = [format_sse(changes, "availability", self.event_id(event_seq))
+                    for event_seq, changes in events]
+        return (events[-1][0] if events else seq), messages
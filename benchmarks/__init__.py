@@ -0,0 +1,3 @@
+# WSAA-project: Web Services and Applications.
+# Load-test and latency benchmarks (run with: python -m benchmarks.load_test).
+# Author: Laura Lyons
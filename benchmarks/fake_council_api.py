@@ -0,0 +1,136 @@
+# WSAA-project: Web Services and Applications.
+# Local stand-in for the Cork City Council datastore_search_sql endpoint.
+# Author: Laura Lyons
+#
+# Run on its own with:  python -m benchmarks.fake_council_api --port 8001
+# and start the app with LIVE_FEED_API_URL=http://127.0.0.1:8001/api/3/action/datastore_search_sql
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PATH = "/api/3/action/datastore_search_sql"
+
+CAR_PARK_NAMES = ["Saint Finbarr's", "Merchants Quay", "Grand Parade", "Carrolls Quay",
+                  "City Hall - Eglington Street", "Black Ash Park & Ride",
+                  "Paul Street", "North Main Street"]
+
+
+def make_record(car_park_id, free_spaces):
+    """ One record shaped like the council feed. """
+    name = CAR_PARK_NAMES[(car_park_id - 1) % len(CAR_PARK_NAMES)]
+    if car_park_id > len(CAR_PARK_NAMES):
+        name = f"{name} {car_park_id}"
+    return {
+        "_id": car_park_id,
+        "name": name,
+        "spaces": 500,
+        "free_spaces": free_spaces,
+        "opening_times": "Mon-Sun 07:00-23:00",
+        "notes": "",
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "latitude": 51.8985 + car_park_id / 1000,
+        "longitude": -8.4756 - car_park_id / 1000,
+        "price": "3.00 per hour"
+    }
+
+
+class FakeCouncilAPI:
+    """
+    Serves datastore_search_sql responses from a local HTTP server.
+
+    latency is added to every response (seconds), car_parks sets the number of
+    records (the payload size), failure_rate is the fraction of requests that
+    get a 500, and churn is the fraction of car parks whose free spaces change
+    between calls. Every call is counted so the benchmark can report upstream
+    calls per request.
+    """
+    def __init__(self, latency=0.2, car_parks=8, failure_rate=0.0, churn=0.5, seed=1):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.churn = churn
+        self._random = random.Random(seed)
+        self._free_spaces = {car_park_id: self._random.randint(0, 500) for car_park_id in range(1, car_parks + 1)}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0}
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def respond(self):
+        """ Returns (status, body) for one call. """
+        with self._lock:
+            self._stats["calls"] += 1
+            if self._random.random() < self.failure_rate:
+                self._stats["failures"] += 1
+                return 500, {"success": False, "error": {"message": "Internal Server Error"}}
+            for car_park_id in self._free_spaces:
+                if self._random.random() < self.churn:
+                    self._free_spaces[car_park_id] = self._random.randint(0, 500)
+            records = [make_record(car_park_id, free) for car_park_id, free in self._free_spaces.items()]
+        return 200, {"success": True, "result": {"records": records}}
+
+    def start(self, host="127.0.0.1", port=0):
+        """ Starts serving on a background thread (port 0 picks a free port). """
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != API_PATH:
+                    self.send_error(404)
+                    return
+                time.sleep(api.latency)
+                status, body = api.respond()
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output readable
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-council-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops the server. """
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def stats(self):
+        """ Returns the call and failure counters. """
+        with self._lock:
+            return dict(self._stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the council live parking API")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--car-parks", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--churn", type=float, default=0.5)
+    args = parser.parse_args()
+
+    fake_api = FakeCouncilAPI(args.latency_ms / 1000, args.car_parks, args.failure_rate, args.churn)
+    fake_api.start(port=args.port)
+    print(f"Fake council API on {fake_api.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(60)
+            print("Upstream calls so far:", fake_api.stats())
+    except KeyboardInterrupt:
+        fake_api.stop()
@@ -0,0 +1,245 @@
+# WSAA-project: Web Services and Applications.
+# SQLite-backed stand-in for MySQL, plugged into the connection pool for benchmarks.
+# Author: Laura Lyons
+
+import datetime as dt
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from pymysql.err import IntegrityError, OperationalError, ProgrammingError
+
+SCHEMA_SQL = """
+    CREATE TABLE carparkdetails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(255) NOT NULL UNIQUE,
+        height DECIMAL(4, 2)
+    );
+    CREATE TABLE openinghours (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        car_park_id INT NOT NULL,
+        day_of_week VARCHAR(10) NOT NULL,
+        opening_time VARCHAR(8),
+        closing_time VARCHAR(8),
+        status VARCHAR(20)
+    );
+    CREATE INDEX openinghours_car_park ON openinghours (car_park_id);
+"""
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# MySQL syntax used by the DAOs, rewritten for SQLite
+REWRITES = [
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), "INSERT OR IGNORE"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)", re.I), r"excluded.\1"),
+    (re.compile(r"\bLEAST\(", re.I), "MIN("),
+    (re.compile(r"\bGREATEST\(", re.I), "MAX("),
+    (re.compile(r"\bTIMESTAMPDIFF\(\s*SECOND\s*,", re.I), "TIMESTAMPDIFF_SECOND("),
+    (re.compile(r"CAST\(('[^']*') AS DATETIME\)\s*\+\s*INTERVAL\s*\((.*)\)\s*SECOND", re.I),
+     r"ADD_SECONDS(\1, \2)"),
+]
+
+# MySQL DATE_FORMAT specifiers that differ from strftime
+DATE_FORMAT_CODES = {"%i": "%M", "%s": "%S"}
+
+
+def translate(sql, params):
+    """ Rewrites a PyMySQL query (%s placeholders, MySQL syntax) for sqlite3. """
+    if params is not None:
+        # PyMySQL formats the query with %, so %% is a literal percent sign
+        sql = re.sub(r"%(s|%)", lambda match: "?" if match.group(1) == "s" else "%", sql)
+    for pattern, replacement in REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _parse_datetime(value):
+    return dt.datetime.fromisoformat(str(value))
+
+
+def _date_format(value, fmt):
+    if value is None:
+        return None
+    for mysql_code, strftime_code in DATE_FORMAT_CODES.items():
+        fmt = fmt.replace(mysql_code, strftime_code)
+    return _parse_datetime(value).strftime(fmt)
+
+
+def _timestamp_diff_seconds(start, end):
+    if start is None or end is None:
+        return None
+    return int((_parse_datetime(end) - _parse_datetime(start)).total_seconds())
+
+
+def _add_seconds(value, seconds):
+    if value is None or seconds is None:
+        return None
+    return (_parse_datetime(value) + dt.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+sqlite3.register_adapter(dt.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(dt.date, lambda value: value.isoformat())
+sqlite3.register_adapter(dt.time, lambda value: value.isoformat())
+sqlite3.register_adapter(dt.timedelta, str)
+
+
+class FakeCursor:
+    """ Mimics a PyMySQL DictCursor. """
+    def __init__(self, database, cursor):
+        self.database = database
+        self._cursor = cursor
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self, method, sql, params):
+        self.database.round_trip()
+        try:
+            method(sql, params)
+        except sqlite3.IntegrityError as err:
+            raise IntegrityError(1062, str(err)) from err
+        except sqlite3.OperationalError as err:
+            if "locked" in str(err) or "busy" in str(err):
+                raise OperationalError(1205, str(err)) from err
+            raise ProgrammingError(1064, str(err)) from err
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+
+    def execute(self, sql, params=None):
+        if params is not None and not isinstance(params, (tuple, list, dict)):
+            params = (params,)
+        self._run(self._cursor.execute, translate(sql, params), params if params is not None else ())
+        return self.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        # PyMySQL sends a batched INSERT as one multi-row statement: one round-trip
+        self._run(self._cursor.executemany, translate(sql, ()), list(seq_of_params))
+        return self.rowcount
+
+    def _as_dict(self, row):
+        if row is None:
+            return None
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._as_dict(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._as_dict(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    """ Mimics the parts of a PyMySQL connection used by the DAOs and the pool. """
+    def __init__(self, database):
+        self.database = database
+        self._conn = sqlite3.connect(database.path, timeout=30, check_same_thread=False)
+        self._conn.create_function("DATE_FORMAT", 2, _date_format)
+        self._conn.create_function("TIMESTAMPDIFF_SECOND", 2, _timestamp_diff_seconds)
+        self._conn.create_function("ADD_SECONDS", 2, _add_seconds)
+        self._conn.create_function("FLOOR", 1, lambda value: None if value is None else math.floor(value))
+        self.open = True
+
+    def cursor(self):
+        return FakeCursor(self.database, self._conn.cursor())
+
+    def begin(self):
+        pass  # sqlite3 opens the transaction on the first write
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=True):
+        if not self.open:
+            raise OperationalError(2006, "MySQL server has gone away")
+
+    def close(self):
+        if self.open:
+            self._conn.close()
+            self.open = False
+
+
+class FakeDatabase:
+    """
+    A throwaway SQLite file holding the app's tables, seeded with car parks,
+    a week of opening hours each and recent occupancy history.
+
+    Every statement sleeps for `latency` seconds to stand in for the network
+    round-trip to MySQL, and is counted so the benchmark can report database
+    round-trips per request. Pass `connect` to ConnectionPool(connect_fn=...).
+    """
+    def __init__(self, car_parks=8, latency=0.001, history_hours=24, sample_minutes=5):
+        self.latency = latency
+        handle, self.path = tempfile.mkstemp(prefix="wsaa-bench-", suffix=".sqlite3")
+        os.close(handle)
+        self._lock = threading.Lock()
+        self._round_trips = 0
+        self._create(car_parks, history_hours, sample_minutes)
+
+    def _create(self, car_parks, history_hours, sample_minutes):
+        # Imported here so the history table definitions stay in one place
+        from dao.occupancy_history_dao import CREATE_HISTORY_SQL, CREATE_HOURLY_SQL
+
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA_SQL)
+        conn.execute(CREATE_HISTORY_SQL)
+        conn.execute(CREATE_HOURLY_SQL)
+
+        for car_park_id in range(1, car_parks + 1):
+            conn.execute("INSERT INTO carparkdetails (id, name, height) VALUES (?, ?, ?)",
+                         (car_park_id, f"Car Park {car_park_id}", 1.9 + (car_park_id % 5) / 10))
+            conn.executemany(
+                "INSERT INTO openinghours (car_park_id, day_of_week, opening_time, closing_time, status) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(car_park_id, day, "07:00:00", "23:00:00", "open") for day in DAYS])
+
+        now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+        samples = []
+        for step in range(history_hours * 60 // sample_minutes):
+            recorded_at = (now - dt.timedelta(minutes=step * sample_minutes)).isoformat(" ")
+            for car_park_id in range(1, car_parks + 1):
+                samples.append((car_park_id, recorded_at, (car_park_id * 37 + step * 11) % 500))
+        conn.executemany("INSERT INTO occupancyhistory (car_park_id, recorded_at, free_spaces) VALUES (?, ?, ?)",
+                         samples)
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        """ Opens a new stand-in connection (the pool's connect_fn). """
+        return FakeConnection(self)
+
+    def round_trip(self):
+        with self._lock:
+            self._round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def round_trips(self):
+        """ Statements executed so far. """
+        with self._lock:
+            return self._round_trips
+
+    def remove(self):
+        """ Deletes the database files. """
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,386 @@
+# WSAA-project: Web Services and Applications.
+# Load-test and latency benchmark for the Flask app (serverA.PY).
+# Author: Laura Lyons
+#
+# Runs the app on a local port against a fake council API and an SQLite
+# stand-in for MySQL, drives each route with concurrent clients and reports
+# throughput, p50/p95/p99 latency, DB round-trips and upstream calls per request.
+#
+#   python -m benchmarks.load_test
+#   python -m benchmarks.load_test --clients 16 --duration 10 --save baseline.json
+#   python -m benchmarks.load_test --baseline baseline.json   # exits 1 on a regression
+
+import argparse
+import contextlib
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import dbconfig  # noqa: E402
+import feedconfig  # noqa: E402
+from benchmarks.fake_council_api import FakeCouncilAPI  # noqa: E402
+from benchmarks.fake_database import DAYS, FakeDatabase  # noqa: E402
+
+WEEK_HOURS = {day: ["08:00", "20:00"] for day in DAYS}
+
+
+# Each scenario function sends one request and returns its status code.
+# `state` is per client: a random generator, the last ETag seen and the
+# settings shared by every client (car park ids, ids created by the run).
+
+def get(path):
+    def scenario(session, base_url, state):
+        return session.get(base_url + path, timeout=30).status_code
+    return scenario
+
+
+def get_for_car_park(template):
+    def scenario(session, base_url, state):
+        car_park_id = state["rng"].choice(state["car_park_ids"])
+        return session.get(base_url + template.format(id=car_park_id), timeout=30).status_code
+    return scenario
+
+
+def revalidate_car_parks(session, base_url, state):
+    """ A browser re-polling the list: If-None-Match with the ETag it already has. """
+    headers = {"If-None-Match": state["etag"]} if state.get("etag") else {}
+    response = session.get(base_url + "/api/car-parks", headers=headers, timeout=30)
+    state["etag"] = response.headers.get("ETag", state.get("etag"))
+    return response.status_code
+
+
+def stream_connect(session, base_url, state):
+    """ Time to the first server-sent event (the snapshot) on a new connection. """
+    with session.get(base_url + "/api/car-parks/stream", stream=True, timeout=30) as response:
+        for line in response.iter_lines():
+            if line.startswith(b"data:"):
+                break
+        return response.status_code
+
+
+def browse(session, base_url, state):
+    """ The page's own traffic: the list, then the three lookups for a selected car park. """
+    rng = state["rng"]
+    choice = rng.random()
+    if choice < 0.25:
+        path = "/api/car-parks"
+    else:
+        template = rng.choice(["/api/car-parks/{id}", "/api/opening-hours/{id}", "/api/height-restriction/{id}"])
+        path = template.format(id=rng.choice(state["car_park_ids"]))
+    return session.get(base_url + path, timeout=30).status_code
+
+
+def add_car_park(session, base_url, state):
+    data = {"name": f"Bench {uuid.uuid4().hex[:12]}", "height_restriction": 2.1, "opening_hours": WEEK_HOURS}
+    response = session.post(base_url + "/api/add-car-park", json=data, timeout=30)
+    if response.ok:
+        state["created_ids"].append(response.json()["car_park_id"])
+    return response.status_code
+
+
+def update_car_park(session, base_url, state):
+    data = {"id": state["rng"].choice(state["car_park_ids"]),
+            "height_restriction": round(state["rng"].uniform(1.8, 2.5), 2),
+            "opening_hours": {day: {"open": "07:00", "close": "23:00"} for day in DAYS}}
+    return session.post(base_url + "/update_car_park", json=data, timeout=30).status_code
+
+
+def add_opening_hours(session, base_url, state):
+    data = {"car_park_id": state["rng"].choice(state["car_park_ids"]),
+            "opening_time": "08:00", "closing_time": "20:00"}
+    return session.post(base_url + "/api/add-opening-hours", json=data, timeout=30).status_code
+
+
+def delete_car_park(session, base_url, state):
+    """ Deletes car parks created by the add-car-park scenario (None once they are used up). """
+    try:
+        car_park_id = state["created_ids"].pop()
+    except IndexError:
+        return None
+    return session.post(base_url + "/delete_car_park", data={"car_park_id": str(car_park_id)},
+                        timeout=30).status_code
+
+
+SCENARIOS = [
+    ("index", get("/")),
+    ("car-parks", get("/api/car-parks")),
+    ("car-parks-revalidate", revalidate_car_parks),
+    ("availability", get_for_car_park("/api/car-parks/{id}")),
+    ("opening-hours", get_for_car_park("/api/opening-hours/{id}")),
+    ("height-restriction", get_for_car_park("/api/height-restriction/{id}")),
+    ("details", get_for_car_park("/api/car-parks/{id}/details")),
+    ("history", get_for_car_park("/api/car-parks/{id}/history?bucket=1h")),
+    ("stream-connect", stream_connect),
+    ("live-feed-stats", get("/api/live-feed/stats")),
+    ("db-pool-stats", get("/api/db-pool/stats")),
+    ("read-cache-stats", get("/api/read-cache/stats")),
+    ("occupancy-recorder-stats", get("/api/occupancy-recorder/stats")),
+    ("car-park-view-stats", get("/api/car-park-view/stats")),
+    ("browse-mix", browse),
+    ("add-car-park", add_car_park),
+    ("update-car-park", update_car_park),
+    ("add-opening-hours", add_opening_hours),
+    ("delete-car-park", delete_car_park),
+]
+
+
+def percentile(sorted_values, pct):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class BenchmarkEnvironment:
+    """ The fake council API, the stand-in database and the Flask app on a local port. """
+    def __init__(self, args):
+        if not args.verbose:
+            logging.disable(logging.CRITICAL)  # Expected errors (e.g. injected upstream failures)
+        self.fake_api = FakeCouncilAPI(latency=args.upstream_latency_ms / 1000, car_parks=args.car_parks,
+                                       failure_rate=args.upstream_failure_rate, churn=args.churn).start()
+        self.database = FakeDatabase(car_parks=args.car_parks, latency=args.db_latency_ms / 1000)
+
+        # Configuration has to be in place before the app and its DAOs are imported
+        feedconfig.live_feed["api_url"] = self.fake_api.url
+        feedconfig.occupancy_history["enabled"] = args.with_recorder
+
+        from dao.connection_pool import ConnectionPool, install_pool
+        self.pool = ConnectionPool(size=args.pool_size, timeout=dbconfig.mysql.get("pool_timeout", 10),
+                                   connect_fn=self.database.connect)
+        install_pool(self.pool)
+
+        from live_feed import live_feed
+        live_feed.refresh_interval = args.feed_refresh
+        self.live_feed = live_feed
+
+        with self.quiet(args.verbose):
+            self.server_module = self._load_server()
+        # Idle streams notice closed connections on their next keep-alive
+        self.server_module.service.STREAM_KEEPALIVE = 1
+
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.http_server = make_server("127.0.0.1", 0, self.server_module.app, threaded=True,
+                                       request_handler=QuietHandler)
+        self.base_url = f"http://127.0.0.1:{self.http_server.server_port}"
+        threading.Thread(target=self.http_server.serve_forever, name="benchmark-server", daemon=True).start()
+
+    @staticmethod
+    def _load_server():
+        path = os.path.join(REPO_ROOT, "serverA.PY")
+        loader = importlib.machinery.SourceFileLoader("serverA", path)
+        spec = importlib.util.spec_from_file_location("serverA", path, loader=loader)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["serverA"] = module  # Flask finds templates/ through the module
+        loader.exec_module(module)
+        return module
+
+    @staticmethod
+    @contextlib.contextmanager
+    def quiet(verbose):
+        """ Silences the app's debug prints (unless --verbose). """
+        if verbose:
+            yield
+            return
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def counters(self):
+        """ (DB round-trips, pool checkouts, upstream calls) so far. """
+        return self.database.round_trips, self.pool.stats()["checkouts"], self.fake_api.stats()["calls"]
+
+    def wait_for_live_feed(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while not self.live_feed.get_index(wait=1) and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+    def close(self):
+        self.http_server.shutdown()
+        self.live_feed.stop()
+        self.fake_api.stop()
+        self.pool.close()
+        self.database.remove()
+        logging.disable(logging.NOTSET)
+
+
+def run_scenario(env, name, scenario, args, shared):
+    """ Drives one scenario with args.clients concurrent clients and returns its results. """
+    latencies = []
+    statuses = {}
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [args.requests] if args.requests else None
+    stop_at = time.monotonic() + args.duration
+
+    def client(index):
+        session = requests.Session()
+        state = dict(shared, rng=random.Random(index))
+        while time.monotonic() < stop_at:
+            if remaining is not None:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status = scenario(session, env.base_url, state)
+            except requests.exceptions.RequestException:
+                status = "error"
+            elapsed = time.perf_counter() - started
+            if status is None:
+                break  # Nothing left to do (e.g. no car parks left to delete)
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status == "error" or status >= 500:
+                    errors[0] += 1
+        session.close()
+
+    db_before, checkouts_before, upstream_before = env.counters()
+    started = time.perf_counter()
+    with env.quiet(args.verbose):
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall_time = time.perf_counter() - started
+    db_after, checkouts_after, upstream_after = env.counters()
+
+    count = len(latencies)
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": count,
+        "errors": errors[0],
+        "statuses": statuses,
+        "throughput": round(count / wall_time, 1) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+        "db_round_trips_per_request": round((db_after - db_before) / count, 3) if count else 0.0,
+        "pool_checkouts_per_request": round((checkouts_after - checkouts_before) / count, 3) if count else 0.0,
+        "upstream_calls_per_request": round((upstream_after - upstream_before) / count, 4) if count else 0.0,
+    }
+
+
+def print_results(results, out=sys.stdout):
+    header = (f"{'scenario':<26}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'p99 ms':>9}{'db/req':>8}{'up/req':>8}")
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for r in results:
+        print(f"{r['scenario']:<26}{r['requests']:>7}{r['errors']:>5}{r['throughput']:>9.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['db_round_trips_per_request']:>8.2f}{r['upstream_calls_per_request']:>8.3f}", file=out)
+
+
+def compare_with_baseline(results, baseline, max_regression):
+    """ Returns a description of every scenario that got slower or chattier than the baseline. """
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        base = previous.get(r["scenario"])
+        if not base or not r["requests"]:
+            continue
+        # Ignore sub-millisecond jitter on the fastest routes
+        if r["p95_ms"] > base["p95_ms"] * (1 + max_regression) and r["p95_ms"] - base["p95_ms"] > 1:
+            regressions.append(f"{r['scenario']}: p95 {base['p95_ms']}ms -> {r['p95_ms']}ms")
+        if r["db_round_trips_per_request"] > base["db_round_trips_per_request"] + 0.05:
+            regressions.append(f"{r['scenario']}: DB round-trips/request "
+                               f"{base['db_round_trips_per_request']} -> {r['db_round_trips_per_request']}")
+        if r["upstream_calls_per_request"] > base["upstream_calls_per_request"] + 0.01:
+            regressions.append(f"{r['scenario']}: upstream calls/request "
+                               f"{base['upstream_calls_per_request']} -> {r['upstream_calls_per_request']}")
+        if r["errors"] > base["errors"]:
+            regressions.append(f"{r['scenario']}: errors {base['errors']} -> {r['errors']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    names = [name for name, _ in SCENARIOS]
+    parser = argparse.ArgumentParser(description="Load-test the car park API against local stand-ins")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients per scenario")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per scenario")
+    parser.add_argument("--requests", type=int, default=0, help="stop each scenario after this many requests")
+    parser.add_argument("--scenarios", nargs="+", choices=names, default=names, metavar="NAME",
+                        help="scenarios to run (default: all): " + ", ".join(names))
+    parser.add_argument("--car-parks", type=int, default=8, help="car parks in the feed and database")
+    parser.add_argument("--upstream-latency-ms", type=float, default=200)
+    parser.add_argument("--upstream-failure-rate", type=float, default=0.0)
+    parser.add_argument("--churn", type=float, default=0.5,
+                        help="fraction of car parks whose free spaces change per upstream call")
+    parser.add_argument("--feed-refresh", type=float, default=1.0, help="seconds between live feed polls")
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="simulated MySQL round-trip time")
+    parser.add_argument("--pool-size", type=int, default=dbconfig.mysql.get("pool_size", 5))
+    parser.add_argument("--with-recorder", action="store_true",
+                        help="also run the occupancy recorder (adds background DB writes)")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with results saved by --save")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed p95 slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--verbose", action="store_true", help="show the app's prints and error logging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = dict(SCENARIOS)
+
+    print(f"Starting app with a fake council API ({args.upstream_latency_ms:.0f}ms, "
+          f"{args.upstream_failure_rate:.0%} failures) and SQLite stand-in ({args.db_latency_ms:.1f}ms/query)...")
+    env = BenchmarkEnvironment(args)
+    try:
+        env.wait_for_live_feed()
+        shared = {"car_park_ids": list(range(1, args.car_parks + 1)), "created_ids": []}
+
+        results = []
+        for name in args.scenarios:
+            result = run_scenario(env, name, scenarios[name], args, shared)
+            results.append(result)
+            print(f"  {name}: {result['requests']} requests, p95 {result['p95_ms']}ms")
+
+        print()
+        print(f"{args.clients} clients, {args.duration:g}s per scenario, feed polled every {args.feed_refresh:g}s")
+        print_results(results)
+    finally:
+        env.close()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+        print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
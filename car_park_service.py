@@ -0,0 +1,309 @@
+# WSAA-project: Web Services and Applications.
+# Business logic shared by the Flask (serverA.PY) and ASGI (asgi_server.py) apps.
+# Author: Laura Lyons
+
+import datetime as dt
+import decimal
+import json
+import logging
+import re
+
+import feedconfig
+from http_cache import http_date
+from availability_stream import AvailabilityBroadcaster
+from car_park_view import CarParkAvailabilityView, free_spaces_for
+from dao.car_parks_dao import CarParksDAO
+from dao.occupancy_history_dao import OccupancyHistoryDAO
+from dao.opening_hours_dao import OpeningHoursDAO
+from live_feed import live_feed
+from occupancy_recorder import OccupancyRecorder, utc_now
+
+# Each function returns (body, status) so either web framework can wrap it.
+# Handlers that only read caches never touch the network or MySQL.
+
+
+def _json_default(value):
+    """ Serialises the MySQL column types that json.dumps does not know about. """
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (dt.date, dt.datetime, dt.time)):
+        return value.isoformat()
+    if isinstance(value, dt.timedelta):  # PyMySQL returns TIME columns as timedelta
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    """ Compact JSON encoding used for pre-serialised responses. """
+    return json.dumps(data, default=_json_default, separators=(",", ":"), sort_keys=True)
+
+
+# DAO instances (both draw connections from the shared pool)
+car_parks_dao = CarParksDAO()
+opening_hours_dao = OpeningHoursDAO()
+occupancy_history_dao = OccupancyHistoryDAO()
+
+# Samples the live feed into the history tables (started by the servers)
+occupancy_recorder = OccupancyRecorder(occupancy_history_dao, live_feed)
+
+# Seconds between keep-alive comments on idle availability streams
+STREAM_KEEPALIVE = 15
+
+# Pushes changed free spaces to browsers subscribed to /api/car-parks/stream
+availability_broadcaster = AvailabilityBroadcaster(live_feed)
+
+# Car parks merged with live data, rebuilt only when MySQL or the feed changes
+car_park_view = CarParkAvailabilityView(car_parks_dao, live_feed, dumps=dumps)
+
+
+def warm_read_cache():
+    """ Preload car parks, height restrictions and opening hours status in one query """
+    for park in car_parks_dao.get_all_car_parks_with_hours():
+        car_parks_dao.prime_cache(park)
+        opening_hours_dao.prime_cache(park["id"], park["opening_hours"])
+
+
+def start_occupancy_recorder():
+    """ Starts recording the live feed into the history tables (if enabled in feedconfig) """
+    if feedconfig.occupancy_history.get("enabled", True):
+        occupancy_recorder.start()
+
+
+def list_car_parks():
+    """ All car parks merged with live data, as a ready-to-send JSON string plus its validators """
+    _, body, etag, last_modified = car_park_view.get_with_validators()
+    return body, 200, {"ETag": etag, "Last-Modified": http_date(last_modified)}
+
+
+def car_park_availability(car_park_id):
+    """ Live free spaces for one car park """
+    free_spaces = free_spaces_for(live_feed.get_index(), car_park_id)
+    return {"car_park_id": car_park_id, "free_spaces": free_spaces}, 200
+
+
+def opening_hours_today(car_park_id):
+    """ Today's opening hours for one car park """
+    # Each day's response is precomputed and cached, so this is just a lookup
+    week_status = opening_hours_dao.get_week_status(car_park_id)
+
+    if not week_status:
+        return {"message": "There is no data available for the opening hours car park."}, 200
+
+    today = dt.datetime.today().strftime("%A")
+    today_status = week_status.get(today)
+
+    if today_status:
+        return today_status, 200
+
+    return {"message": f"No opening hours available for {today}."}, 200
+
+
+def height_restriction(car_park_id):
+    """ Height restriction for one car park """
+    restriction = car_parks_dao.get_height_restriction(car_park_id)
+
+    logging.debug("Height restriction for car park %s: %s", car_park_id, restriction)
+
+    if restriction:
+        height_value = float(restriction["height"])  # Extract only the numerical value
+        formatted_height = f"{height_value:.2f}m"  # Ensure correct unit display
+
+        return {"height_restriction": formatted_height}, 200
+
+    logging.debug("No height restriction found for car park %s", car_park_id)
+    return {"message": "No height restriction available for this car park."}, 200
+
+
+def add_car_park(data):
+    """ Creates a car park and its weekly opening hours """
+    try:
+        name = data.get('name')
+        height = data.get('height_restriction')
+        opening_hours = data.get('opening_hours', {})
+
+        logging.debug("Opening hours received: %s", opening_hours)
+
+        if not name or name.strip() == "":
+            return {"error": "Car park name cannot be empty"}, 400
+
+        if not opening_hours:
+            return {"error": "Opening hours data is missing!"}, 400
+
+        # Collect all days with both times so the week is written in one transaction
+        week = [(day, times[0], times[1], "active")
+                for day, times in opening_hours.items() if times and times[0] and times[1]]
+
+        new_id = car_parks_dao.create_car_park_with_hours(name, height, week)
+
+        if new_id is None:
+            return {"error": f"Car park '{name}' already exists"}, 400
+        if new_id is False:
+            return {"error": "Database error while adding car park"}, 500
+
+        return {"message": f"Car park '{name}' added with full weekly hours!", "car_park_id": new_id}, 200
+
+    except (AttributeError, KeyError, ValueError, TypeError) as e:
+        logging.error("Error adding car park: %s", e)
+        return {"error": "Internal Server Error"}, 500
+
+
+def add_opening_hours(data):
+    """ Adds opening hours for a car park """
+    car_park_id = data.get('car_park_id')  # Links to car park ID
+    opening_time = data.get('opening_time')
+    closing_time = data.get('closing_time')
+    is_24_hours = data.get('is_24_hours', False)
+
+    sql = """
+    INSERT INTO opening_hours (car_park_id, opening_time, closing_time, is_24_hours)
+    VALUES (%s, %s, %s, %s)
+    """
+
+    opening_hours_dao.execute_query(sql, (car_park_id, opening_time, closing_time, is_24_hours))
+
+    return {"message": f"Opening hours added for Car Park ID {car_park_id}!"}, 200
+
+
+def delete_car_park(car_park_id):
+    """ Deletes a car park and its opening hours (car_park_id as submitted by the form) """
+    if not car_park_id or not car_park_id.isdigit():
+        return {"message": "Invalid car park ID provided."}, 400
+
+    # Check if car park exists before attempting deletion
+    if not car_parks_dao.get_car_park_by_id(car_park_id):
+        return {"message": "Error: Car park not found."}, 404
+
+    if car_parks_dao.delete_car_park_and_hours(car_park_id):
+        return {"message": "Car park and opening hours deleted successfully."}, 200
+
+    return {"message": "Database transaction failed. Car park was not deleted."}, 500
+
+
+def car_park_details(car_park_id):
+    """ One car park with its opening hours for each day """
+    # One JOIN query returns the car park together with its whole week
+    car_park = car_parks_dao.get_car_park_with_hours(car_park_id)
+    if not car_park:
+        return {"message": "Car park not found."}, 404
+
+    opening_hours = car_park.pop("opening_hours")
+    hours_dict = {}
+
+    for record in opening_hours:
+        day = record.get("day_of_week")
+
+        # Check if the times are missing (or NA) and status is 'closed'
+        if (not record.get("opening_time") or record.get("opening_time") in ["NA", ""]) and \
+           (not record.get("closing_time") or record.get("closing_time") in ["NA", ""]) and \
+           (record.get("status") or "").lower() == "closed":
+            hours_dict[day] = "This car park is closed today"
+        elif car_park.get("is_24_hours"):
+            hours_dict[day] = "This car park is open 24 hours"
+        else:
+            hours_dict[day] = {
+                "open": record.get("opening_time"),
+                "close": record.get("closing_time")
+            }
+
+    car_park["opening_hours"] = hours_dict
+    return car_park, 200
+
+
+def update_car_park(data):
+    """ Updates the height restriction and opening hours of a car park """
+    car_park_id = data.get("id")
+    new_hours = data.get("opening_hours") or {}
+    new_height = data.get("height_restriction")
+    is_24_hours = data.get("is_24_hours", False)
+
+    # Ensure the car park exists:
+    if not car_parks_dao.get_car_park_by_id(car_park_id):
+        return {"message": "Error: Car park not found."}, 404
+
+    try:
+        new_height = float(new_height) if new_height else None
+    except ValueError:
+        return {"message": "Error: Invalid height provided."}, 400
+
+    week = []
+    for day, times in new_hours.items():
+        if is_24_hours:
+            status = "24 hours"
+            opening_time = "00:00"  # Or choose appropriate times
+            closing_time = "23:59"
+        else:
+            if times.get("open", "") == "" or times.get("close", "") == "":
+                status = "closed"
+                opening_time = None
+                closing_time = None
+            else:
+                status = "open"
+                opening_time = times.get("open")
+                closing_time = times.get("close")
+        week.append((day, opening_time, closing_time, status))
+
+    # Height and every day's hours are written in a single transaction
+    if car_parks_dao.update_car_park_with_hours(car_park_id, new_height, week):
+        return {"message": "Car park updated successfully."}, 200
+
+    return {"message": "Error updating car park."}, 500
+
+
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+MAX_HISTORY_POINTS = 5000
+
+
+def parse_bucket(value):
+    """ Parses a bucket size such as "900", "15m", "1h" or "1d" into seconds. """
+    match = re.fullmatch(r"(\d+)([smhd]?)", (value or "").strip())
+    if not match:
+        raise ValueError(f"Invalid bucket '{value}'")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2) or "s"]
+
+
+def occupancy_history(car_park_id, args):
+    """
+    Min/avg/max free spaces per time bucket for one car park.
+
+    `args` holds the optional query parameters: from/to as ISO 8601 UTC
+    datetimes (default: the last 24 hours) and bucket (default: 1h).
+    """
+    try:
+        end = dt.datetime.fromisoformat(args["to"]) if args.get("to") else utc_now()
+        start = dt.datetime.fromisoformat(args["from"]) if args.get("from") else end - dt.timedelta(days=1)
+        bucket = parse_bucket(args.get("bucket") or "1h")
+    except ValueError as e:
+        return {"message": f"Invalid history query: {e}"}, 400
+
+    # Compare naive UTC datetimes, as stored in the history tables
+    if start.tzinfo:
+        start = start.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    if end.tzinfo:
+        end = end.astimezone(dt.timezone.utc).replace(tzinfo=None)
+
+    if start >= end:
+        return {"message": "'from' must be earlier than 'to'."}, 400
+    if bucket < 60:
+        return {"message": "Bucket must be at least 60 seconds."}, 400
+    if (end - start).total_seconds() / bucket > MAX_HISTORY_POINTS:
+        return {"message": f"Too many buckets requested (maximum {MAX_HISTORY_POINTS})."}, 400
+
+    rows = occupancy_history_dao.get_history(car_park_id, start, end, bucket)
+    if rows is None:
+        return {"message": "Occupancy history is unavailable."}, 500
+
+    points = [{
+        "bucket_start": row["bucket_start"].isoformat() if hasattr(row["bucket_start"], "isoformat") else row["bucket_start"],
+        "samples": int(row["samples"]),
+        "min": int(row["min_free"]),
+        "avg": round(float(row["avg_free"]), 1),
+        "max": int(row["max_free"])
+    } for row in rows]
+
+    return {
+        "car_park_id": car_park_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bucket": bucket,
+        "points": points
+    }, 200
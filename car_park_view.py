@@ -0,0 +1,93 @@
+# WSAA-project: Web Services and Applications.
+# Pre-built "car parks with availability" view served by /api/car-parks.
+# Author: Laura Lyons
+
+import json
+import threading
+import time
+
+from http_cache import body_etag
+
+NO_LIVE_DATA = "No live data available"
+
+
+def free_spaces_for(live_index, car_park_id):
+    """ Looks up the free spaces for a car park in the id-keyed live index. """
+    live_record = live_index.get(str(car_park_id))
+    if live_record:
+        return live_record.get("free_spaces", "Unavailable")
+    return NO_LIVE_DATA
+
+
+class CarParkAvailabilityView:
+    """
+    Caches the MySQL car parks merged with the live feed as a ready-to-send
+    JSON body.
+
+    The view is only rebuilt when the carparkdetails table version (bumped by
+    CarParksDAO writes) or the live feed version changes, or after max_age
+    seconds so edits made outside this process are eventually picked up.
+    A strong ETag and Last-Modified time are kept with the body; both only
+    change when a rebuild actually produces different JSON.
+    """
+    def __init__(self, car_parks_dao, feed, dumps=json.dumps, max_age=300):
+        self.car_parks_dao = car_parks_dao
+        self.feed = feed
+        self.dumps = dumps
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._key = None
+        self._built_at = 0
+        self._car_parks = []
+        self._body = None
+        self._etag = None
+        self._last_modified = None
+        self._stats = {"hits": 0, "rebuilds": 0, "db_reloads": 0}
+
+    def _current_key(self):
+        return (self.car_parks_dao.table_version, self.feed.version)
+
+    def get_with_validators(self):
+        """ Returns (car_parks, json_body, etag, last_modified) from one consistent build. """
+        # Read the versions first: if the feed or table changes while the view
+        # is being built, the view is newer than its key and the next request
+        # rebuilds it, rather than stale data being stored under a new key.
+        key = self._current_key()
+        live_index = self.feed.get_index()
+
+        with self._lock:
+            expired = time.monotonic() - self._built_at > self.max_age
+            if self._body is not None and key == self._key and not expired:
+                self._stats["hits"] += 1
+                return self._car_parks, self._body, self._etag, self._last_modified
+
+            # Only go back to MySQL when the table changed (or the view expired)
+            if self._key is None or key[0] != self._key[0] or expired:
+                rows = self.car_parks_dao.get_all_car_parks()
+                self._stats["db_reloads"] += 1
+            else:
+                rows = self._car_parks
+
+            car_parks = []
+            for park in rows:
+                merged = dict(park)
+                merged["free_spaces"] = free_spaces_for(live_index, park["id"])
+                car_parks.append(merged)
+
+            body = self.dumps(car_parks)
+            etag = body_etag(body.encode("utf-8"))
+            if etag != self._etag:
+                self._last_modified = time.time()
+            self._car_parks = car_parks
+            self._body = body
+            self._etag = etag
+            self._key = key
+            self._built_at = time.monotonic()
+            self._stats["rebuilds"] += 1
+            return self._car_parks, self._body, self._etag, self._last_modified
+
+    def stats(self):
+        """ Returns hit/rebuild counters for the view. """
+        with self._lock:
+            return dict(self._stats)
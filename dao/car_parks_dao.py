@@ -3,98 +3,198 @@
 # Author: Laura Lyons
 
 import logging
-import pymysql
+import threading
 from pymysql.err import MySQLError
-import dbconfig as cfg
+from dao.connection_pool import get_pool
+from dao.opening_hours_dao import write_week_hours
+from dao.read_cache import read_cache
 
 logging.basicConfig(level=logging.ERROR)
 
+# Opening hours columns are aliased so they cannot clash with carparkdetails columns
+CAR_PARKS_WITH_HOURS_SQL = """
+    SELECT c.*, o.id AS oh_id, o.car_park_id AS oh_car_park_id, o.day_of_week AS oh_day_of_week,
+           o.opening_time AS oh_opening_time, o.closing_time AS oh_closing_time, o.status AS oh_status
+    FROM carparkdetails c
+    LEFT JOIN openinghours o ON o.car_park_id = c.id
+"""
+
+def group_hours(rows):
+    """ Folds joined car park / opening hours rows into car parks with an `opening_hours` list. """
+    car_parks = {}
+    for row in rows:
+        hours = {key[3:]: row.pop(key) for key in list(row) if key.startswith("oh_")}
+        park = car_parks.setdefault(row["id"], dict(row, opening_hours=[]))
+        if hours.get("id") is not None:
+            park["opening_hours"].append(hours)
+    return list(car_parks.values())
+
 class CarParksDAO:
     """ Data Access Object for car park details. """
-    def __init__(self):
-        try:
-            self.connection = pymysql.connect(
-                host=cfg.mysql["host"],
-                user=cfg.mysql["user"],
-                password=cfg.mysql["password"],
-                database=cfg.mysql["database"],
-                port=cfg.mysql.get("port", 3306),
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            print("Connected to MySQL in CarParksDAO with PyMySQL!")
-        except MySQLError as err:
-            print("Error connecting to MySQL in CarParksDAO:", err)
-            raise
+    # Bumped on every write to carparkdetails so cached views know to rebuild
+    _table_version = 0
+    _version_lock = threading.Lock()
+
+    def __init__(self, pool=None):
+        # Connections are checked out of the shared pool per query, so one
+        # DAO instance can safely be used from every Flask worker thread.
+        self.pool = pool or get_pool()
+
+    @classmethod
+    def _written(cls, car_park_id):
+        """ Bumps the table version and drops cached reads for the car park. """
+        with cls._version_lock:
+            cls._table_version += 1
+        read_cache.invalidate_car_park(car_park_id)
+
+    @property
+    def table_version(self):
+        """ Changes whenever this process writes to carparkdetails. """
+        return CarParksDAO._table_version
 
     def execute_query(self, sql, params=None, fetch=False, fetch_one=False):
         """ Executes a SQL query and returns the result. """
-        if not self.connection or not self.connection.open:
-            logging.error("No active database connection.")
-            return None
-
         try:
-            with self.connection.cursor() as cursor:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
                 cursor.execute(sql, params or ())
+                self.pool.count_query()
                 result = cursor.fetchone() if fetch_one else (cursor.fetchall() if fetch else None)
-                self.connection.commit()
+                connection.commit()
                 return result if fetch or fetch_one else True
         except MySQLError as err:
             logging.error("Query execution failed: %s", err)
             return False if not fetch else None
 
-    def close_connection(self):
-        """ Closes the database connection. """
-        try:
-            if self.connection and self.connection.open:
-                self.connection.close()
-                print("Database connection closed.")
-        except MySQLError as err:
-            logging.error("Error closing connection: %s", err) 
-
     def get_height_restriction(self, car_park_id):
         """Retrieves the height restriction for a specific car park."""
         sql = "SELECT height FROM carparkdetails WHERE id = %s"
-        return self.execute_query(sql, (car_park_id,), fetch_one=True)
+        return read_cache.get_or_load(("height", str(car_park_id)),
+                                      lambda: self.execute_query(sql, (car_park_id,), fetch_one=True))
 
     def create_car_park(self, name, height):
         """Creates a new car park with the given name and height restriction."""
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             # Check if a car park with this name already exists
             cursor.execute("SELECT COUNT(*) FROM carparkdetails WHERE name = %s", (name,))
             existing_count = cursor.fetchone()["COUNT(*)"]
 
             if existing_count > 0:
+                self.pool.count_query()
                 return None  # Prevent duplicate insertion
 
             # If not found, insert the new car park
             sql = "INSERT INTO carparkdetails (name, height) VALUES (%s, %s)"
             cursor.execute(sql, (name, height))
-            self.connection.commit()
+            connection.commit()
+            self.pool.count_query(2)
             new_id = cursor.lastrowid
+        self._written(new_id)
         return new_id
 
     def get_all_car_parks(self):
         """Retrieves all car parks."""
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             cursor.execute("SELECT * FROM carparkdetails")
+            self.pool.count_query()
             result = cursor.fetchall()
         return result
 
     def get_car_park_by_id(self, car_park_id):
         """Retrieves a car park by ID."""
         sql = "SELECT * FROM carparkdetails WHERE id = %s"
-        return self.execute_query(sql, (car_park_id,), fetch_one=True)
+        return read_cache.get_or_load(("car_park", str(car_park_id)),
+                                      lambda: self.execute_query(sql, (car_park_id,), fetch_one=True))
+
+    def get_car_park_with_hours(self, car_park_id):
+        """Retrieves a car park and its whole week of opening hours in one query."""
+        sql = CAR_PARKS_WITH_HOURS_SQL + " WHERE c.id = %s ORDER BY o.id"
+        rows = self.execute_query(sql, (car_park_id,), fetch=True)
+        car_parks = group_hours(rows or [])
+        return car_parks[0] if car_parks else None
+
+    def get_all_car_parks_with_hours(self):
+        """Retrieves every car park with all of its opening hours in one query."""
+        sql = CAR_PARKS_WITH_HOURS_SQL + " ORDER BY c.id, o.id"
+        return group_hours(self.execute_query(sql, fetch=True) or [])
+
+    def prime_cache(self, car_park):
+        """Stores an already-fetched car park row in the read cache."""
+        row = {key: value for key, value in car_park.items() if key != "opening_hours"}
+        read_cache.set(("car_park", str(row["id"])), row)
+        read_cache.set(("height", str(row["id"])), {"height": row.get("height")})
+
+    def create_car_park_with_hours(self, name, height, week):
+        """
+        Creates a car park and its opening hours in a single transaction.
+
+        `week` is a list of (day_of_week, opening_time, closing_time, status) tuples.
+        Returns the new car park ID, None if the name already exists, or False on error.
+        """
+        try:
+            with self.pool.transaction() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM carparkdetails WHERE name = %s", (name,))
+                if cursor.fetchone()["COUNT(*)"] > 0:
+                    self.pool.count_query()
+                    return None  # Prevent duplicate insertion
+
+                cursor.execute("INSERT INTO carparkdetails (name, height) VALUES (%s, %s)", (name, height))
+                new_id = cursor.lastrowid
+                statements = 2 + write_week_hours(cursor, new_id, week)
+        except MySQLError as err:
+            logging.error("Error creating car park: %s", err)
+            return False
+        self.pool.count_query(statements)
+        self._written(new_id)
+        return new_id
+
+    def update_car_park_with_hours(self, car_park_id, new_height, week):
+        """
+        Updates the height restriction and the given days of opening hours
+        in a single transaction.
+
+        Returns True if the transaction commits, otherwise False (rolled back).
+        """
+        try:
+            with self.pool.transaction() as cursor:
+                cursor.execute("UPDATE carparkdetails SET height = %s WHERE id = %s", (new_height, car_park_id))
+                statements = 1 + write_week_hours(cursor, car_park_id, week)
+        except MySQLError as err:
+            logging.error("Error updating car park: %s", err, exc_info=True)
+            return False
+        self.pool.count_query(statements)
+        self._written(car_park_id)
+        return True
 
     def delete_car_park(self, car_park_id):
         """Deletes a car park by ID."""
-         # Check if the car park exists before attempting to delete
-        with self.connection.cursor() as cursor:
+        with self.pool.connection() as connection, connection.cursor() as cursor:
             sql = "DELETE FROM carparkdetails WHERE id = %s"
             cursor.execute(sql, (car_park_id,))
-            self.connection.commit()
+            connection.commit()
+            self.pool.count_query()
             affected = cursor.rowcount
+        self._written(car_park_id)
         return affected > 0
-     
+
+    def delete_car_park_and_hours(self, car_park_id):
+        """
+        Deletes a car park and its opening hours in a single transaction.
+
+        Returns True if the transaction commits, otherwise False (rolled back).
+        """
+        try:
+            with self.pool.transaction() as cursor:
+                # Delete opening hours first
+                cursor.execute("DELETE FROM openinghours WHERE car_park_id = %s", (car_park_id,))
+                # Delete car park
+                cursor.execute("DELETE FROM carparkdetails WHERE id = %s", (car_park_id,))
+        except MySQLError as err:
+            logging.error("Transaction Error: %s", err)
+            return False
+        self.pool.count_query(2)
+        self._written(car_park_id)
+        return True
+
     def update_car_park_height(self, car_park_id, new_height):
         """
         Updates the height restriction in the carparkdetails table.
@@ -106,19 +206,14 @@ class CarParksDAO:
         Returns True if the update is successful, otherwise False.
         """
         try:
-            with self.connection.cursor() as cursor:
-                sql_update_details = "UPDATE carparkdetails SET height = %s WHERE id = %s"
-                cursor.execute(sql_update_details, (new_height, car_park_id))
-            self.connection.commit()
+            with self.pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    sql_update_details = "UPDATE carparkdetails SET height = %s WHERE id = %s"
+                    cursor.execute(sql_update_details, (new_height, car_park_id))
+                connection.commit()
+                self.pool.count_query()
+            self._written(car_park_id)
             return True
         except MySQLError as e:
             logging.error("Error updating car park height: %s", e, exc_info=True)
             return False
-         
-    def __del__(self):
-        try:
-            if self.connection and self.connection.open:
-                self.connection.close()
-        except MySQLError as err:
-            logging.error("Error during cleanup: %s", err)
-
@@ -0,0 +1,257 @@
+# WSAA-project: Web Services and Applications.
+# Shared, thread-safe MySQL connection pool used by the DAOs.
+# Author: Laura Lyons
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.err import MySQLError, OperationalError, InterfaceError
+import dbconfig as cfg
+
+logging.basicConfig(level=logging.ERROR)
+
+
+class PoolTimeoutError(OperationalError):
+    """ Raised when no connection becomes free within the pool timeout. """
+
+
+def connect():
+    """
+    Opens a new PyMySQL connection using dbconfig.
+
+    Autocommit is on so a pooled connection never sits in an open transaction
+    holding an old REPEATABLE READ snapshot; multi-statement writes start
+    their own with begin() (see ConnectionPool.transaction).
+    """
+    return pymysql.connect(
+        host=cfg.mysql["host"],
+        user=cfg.mysql["user"],
+        password=cfg.mysql["password"],
+        database=cfg.mysql["database"],
+        port=cfg.mysql.get("port", 3306),
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=True
+    )
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    Each request checks a connection out with `with pool.connection() as conn:`
+    and it is returned when the block exits. Connections that have been idle
+    for longer than health_check_interval are pinged (and reconnected) before
+    being handed out, and connections that fail mid-query are discarded.
+    """
+    def __init__(self, size=5, timeout=10, health_check_interval=30, connect_fn=connect):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.connect_fn = connect_fn
+
+        # Idle (connection, last_used) pairs, most recently used last. Waiters
+        # sleep on _cond and are woken whenever a connection is returned or a
+        # slot frees up because a broken connection was discarded.
+        self._idle = []
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._created = 0
+        self._in_use = 0
+        self._stats = {"checkouts": 0, "waits": 0, "wait_time_total": 0.0, "wait_time_max": 0.0,
+                       "timeouts": 0, "reconnects": 0, "discarded": 0, "queries": 0}
+
+    @contextmanager
+    def connection(self):
+        """ Checks a connection out of the pool for the duration of the block. """
+        conn = self._checkout()
+        healthy = True
+        try:
+            yield conn
+        except (OperationalError, InterfaceError):
+            healthy = False
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except MySQLError:
+                healthy = False
+            raise
+        finally:
+            self._checkin(conn, healthy)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the block as one transaction and yields a cursor.
+
+        Commits when the block completes. On a MySQLError the transaction is
+        rolled back (and the connection discarded if even that fails) and the
+        error is re-raised for the caller to handle.
+        """
+        with self.connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    connection.begin()
+                    yield cursor
+                connection.commit()
+            except MySQLError:
+                try:
+                    connection.rollback()
+                except MySQLError:
+                    connection.close()  # Closed connections are discarded on check-in
+                raise
+
+    def count_query(self, count=1):
+        """ Records database round-trips for the usage metrics. """
+        with self._lock:
+            self._stats["queries"] += count
+
+    def _checkout(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        create = False
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(f"No database connection free after {self.timeout}s")
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    conn = self.connect_fn()
+                except MySQLError:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+                last_used = time.monotonic()
+
+            conn = self._ensure_healthy(conn, last_used)
+            if conn is not None:
+                break
+
+        wait_time = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+        return conn
+
+    def _ensure_healthy(self, conn, last_used):
+        """ Pings connections that have been idle for a while; returns None if unusable. """
+        if conn.open and time.monotonic() - last_used < self.health_check_interval:
+            return conn
+        try:
+            was_open = conn.open
+            conn.ping(reconnect=True)
+            if not was_open:
+                with self._lock:
+                    self._stats["reconnects"] += 1
+            return conn
+        except MySQLError as err:
+            logging.error("Discarding broken database connection: %s", err)
+            self._discard(conn)
+            return None
+
+    def _checkin(self, conn, healthy=True):
+        if healthy and conn.open:
+            with self._cond:
+                self._in_use -= 1
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+        else:
+            with self._lock:
+                self._in_use -= 1
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except MySQLError:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()  # A waiter may now open a replacement
+
+    def check(self):
+        """ Returns True if a connection can be checked out and pinged. """
+        try:
+            with self.connection() as conn:
+                conn.ping(reconnect=True)
+            return True
+        except MySQLError as err:
+            logging.error("Database health check failed: %s", err)
+            return False
+
+    def stats(self):
+        """ Returns pool size, usage and wait metrics. """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"size": self.size, "open": self._created,
+                          "in_use": self._in_use, "idle": len(self._idle)})
+        stats["wait_time_total"] = round(stats["wait_time_total"], 4)
+        stats["wait_time_max"] = round(stats["wait_time_max"], 4)
+        return stats
+
+    def close(self):
+        """ Closes every idle connection in the pool. """
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except MySQLError as err:
+                logging.error("Error closing connection: %s", err)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ Returns the process-wide pool, creating it from dbconfig on first use. """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                size=cfg.mysql.get("pool_size", 5),
+                timeout=cfg.mysql.get("pool_timeout", 10),
+                health_check_interval=cfg.mysql.get("pool_health_check_interval", 30)
+            )
+        return _pool
+
+
+def install_pool(pool):
+    """
+    Replaces the process-wide pool, closing the previous one.
+
+    Must be called before the DAOs are created (e.g. by the benchmarks, to
+    point the app at a stand-in database).
+    """
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, pool
+    if previous is not None:
+        previous.close()
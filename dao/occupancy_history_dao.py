@@ -0,0 +1,145 @@
+# WSAA-project: Web Services and Applications.
+# DAO (Data Access Object) for the recorded car park occupancy history.
+# Author: Laura Lyons
+
+import logging
+from pymysql.err import MySQLError
+from dao.connection_pool import get_pool
+
+logging.basicConfig(level=logging.ERROR)
+
+# Raw samples, one row per car park per feed refresh. The primary key doubles
+# as the (car_park_id, time) index used by every history query.
+CREATE_HISTORY_SQL = """
+    CREATE TABLE IF NOT EXISTS occupancyhistory (
+        car_park_id INT NOT NULL,
+        recorded_at DATETIME NOT NULL,
+        free_spaces INT NOT NULL,
+        PRIMARY KEY (car_park_id, recorded_at)
+    )
+"""
+
+# Hourly roll-ups of samples older than the raw retention period.
+CREATE_HOURLY_SQL = """
+    CREATE TABLE IF NOT EXISTS occupancyhourly (
+        car_park_id INT NOT NULL,
+        hour_start DATETIME NOT NULL,
+        samples INT NOT NULL,
+        min_free INT NOT NULL,
+        max_free INT NOT NULL,
+        sum_free BIGINT NOT NULL,
+        PRIMARY KEY (car_park_id, hour_start)
+    )
+"""
+
+ROLLUP_SQL = """
+    INSERT INTO occupancyhourly (car_park_id, hour_start, samples, min_free, max_free, sum_free)
+    SELECT car_park_id, DATE_FORMAT(recorded_at, '%%Y-%%m-%%d %%H:00:00'),
+           COUNT(*), MIN(free_spaces), MAX(free_spaces), SUM(free_spaces)
+    FROM occupancyhistory
+    WHERE recorded_at < %s
+    GROUP BY car_park_id, DATE_FORMAT(recorded_at, '%%Y-%%m-%%d %%H:00:00')
+    ON DUPLICATE KEY UPDATE
+        samples = samples + VALUES(samples),
+        min_free = LEAST(min_free, VALUES(min_free)),
+        max_free = GREATEST(max_free, VALUES(max_free)),
+        sum_free = sum_free + VALUES(sum_free)
+"""
+
+# Raw and hourly rows are combined so a range can span both tables; each
+# roll-up row carries its own sample count so averages stay exact. Times are
+# stored as naive UTC, so buckets are counted in seconds since 1970-01-01 with
+# plain DATETIME arithmetic: UNIX_TIMESTAMP/FROM_UNIXTIME would apply the
+# session time zone and shift buckets (and merge or split them around DST).
+HISTORY_SQL = """
+    SELECT CAST('1970-01-01' AS DATETIME)
+               + INTERVAL (FLOOR(TIMESTAMPDIFF(SECOND, '1970-01-01', ts) / %s) * %s) SECOND AS bucket_start,
+           SUM(samples) AS samples, MIN(min_free) AS min_free,
+           MAX(max_free) AS max_free, SUM(sum_free) / SUM(samples) AS avg_free
+    FROM (
+        SELECT recorded_at AS ts, 1 AS samples, free_spaces AS min_free,
+               free_spaces AS max_free, free_spaces AS sum_free
+        FROM occupancyhistory
+        WHERE car_park_id = %s AND recorded_at >= %s AND recorded_at < %s
+        UNION ALL
+        SELECT hour_start, samples, min_free, max_free, sum_free
+        FROM occupancyhourly
+        WHERE car_park_id = %s AND hour_start >= %s AND hour_start < %s
+    ) AS combined
+    GROUP BY bucket_start
+    ORDER BY bucket_start
+"""
+
+class OccupancyHistoryDAO:
+    """ Data Access Object for recorded free-space samples. """
+    def __init__(self, pool=None):
+        self.pool = pool or get_pool()
+
+    def ensure_schema(self):
+        """Creates the history tables if they do not exist yet."""
+        try:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute(CREATE_HISTORY_SQL)
+                cursor.execute(CREATE_HOURLY_SQL)
+                connection.commit()
+                self.pool.count_query(2)
+            return True
+        except MySQLError as err:
+            logging.error("Error creating history tables: %s", err)
+            return False
+
+    def add_samples(self, samples):
+        """
+        Appends a batch of (car_park_id, recorded_at, free_spaces) rows with
+        one executemany call. Duplicate timestamps are ignored.
+        """
+        if not samples:
+            return True
+        sql = """
+            INSERT IGNORE INTO occupancyhistory (car_park_id, recorded_at, free_spaces)
+            VALUES (%s, %s, %s)
+        """
+        try:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
+                cursor.executemany(sql, samples)
+                connection.commit()
+                self.pool.count_query()
+            return True
+        except MySQLError as err:
+            logging.error("Error recording occupancy samples: %s", err)
+            return False
+
+    def rollup_and_prune(self, raw_cutoff, hourly_cutoff):
+        """
+        Folds raw samples older than raw_cutoff into hourly rows, deletes them,
+        and drops hourly rows older than hourly_cutoff, all in one transaction.
+        """
+        try:
+            with self.pool.transaction() as cursor:
+                cursor.execute(ROLLUP_SQL, (raw_cutoff,))
+                cursor.execute("DELETE FROM occupancyhistory WHERE recorded_at < %s", (raw_cutoff,))
+                cursor.execute("DELETE FROM occupancyhourly WHERE hour_start < %s", (hourly_cutoff,))
+        except MySQLError as err:
+            logging.error("Error rolling up occupancy history: %s", err)
+            return False
+        self.pool.count_query(3)
+        return True
+
+    def get_history(self, car_park_id, start, end, bucket_seconds):
+        """
+        Returns min/avg/max free spaces per bucket_seconds bucket in [start, end).
+
+        Ranges older than the raw retention period come from hourly roll-ups,
+        so buckets shorter than an hour are only exact for recent data.
+        """
+        params = (bucket_seconds, bucket_seconds,
+                  car_park_id, start, end,
+                  car_park_id, start, end)
+        try:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute(HISTORY_SQL, params)
+                self.pool.count_query()
+                return cursor.fetchall()
+        except MySQLError as err:
+            logging.error("Error querying occupancy history: %s", err)
+            return None
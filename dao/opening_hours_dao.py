@@ -3,54 +3,94 @@
 # Author: Laura Lyons
 
 import logging
-import pymysql
 from pymysql.err import MySQLError
-import dbconfig as cfg
+from dao.connection_pool import get_pool
+from dao.read_cache import read_cache
 
 logging.basicConfig(level=logging.ERROR)
 
+INSERT_OPENING_HOURS_SQL = """
+    INSERT INTO openinghours (car_park_id, day_of_week, opening_time, closing_time, status)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+def write_week_hours(cursor, car_park_id, week):
+    """
+    Replaces the given days of a car park's opening hours using the caller's cursor.
+
+    `week` is a list of (day_of_week, opening_time, closing_time, status) tuples.
+    Runs one DELETE and one batched INSERT, so it can be part of a larger
+    transaction. Returns the number of statements executed.
+    """
+    if not week:
+        return 0
+    days = [entry[0] for entry in week]
+    placeholders = ", ".join(["%s"] * len(days))
+    cursor.execute(
+        f"DELETE FROM openinghours WHERE car_park_id = %s AND day_of_week IN ({placeholders})",
+        (car_park_id, *days)
+    )
+    cursor.executemany(INSERT_OPENING_HOURS_SQL, [(car_park_id, *entry) for entry in week])
+    return 2
+
+def describe_opening_hours(entry):
+    """ Builds the /api/opening-hours response body for one day's opening hours row. """
+    # Convert times to HH:MM (remove seconds) if they exist, otherwise set to None
+    opening_time = str(entry["opening_time"])[:-3] if entry["opening_time"] else None
+    closing_time = str(entry["closing_time"])[:-3] if entry["closing_time"] else None
+    status = entry.get("status", "Open as usual")
+
+    # If it's "Open 24 Hours" and times are missing, display special message.
+    if status == "24 Hours" and not opening_time and not closing_time:
+        return {"message": "This car park is open 24 hours today"}
+
+    # If the status is "closed" and both times are missing, display closed message.
+    if (status or "").lower() == "closed" and not opening_time and not closing_time:
+        return {"message": "This car park is closed today"}
+
+    # If both opening and closing times exist, return them.
+    if opening_time and closing_time:
+        return {
+            "day": entry["day_of_week"],
+            "opening_time": opening_time,
+            "closing_time": closing_time
+        }
+
+    # Otherwise, return any available time info (or "N/A" for missing fields), along with status.
+    return {
+        "day": entry["day_of_week"],
+        "opening_time": opening_time or "N/A",
+        "closing_time": closing_time or "N/A",
+        "status": status if status != "24 Hours" else None
+    }
+
+def build_week_status(opening_hours):
+    """ Precomputes the response body for every day of the week, keyed by day name. """
+    week = {}
+    for entry in opening_hours:
+        week.setdefault(entry["day_of_week"], describe_opening_hours(entry))
+    return week
+
 class OpeningHoursDAO:
     """ Data Access Object for car park opening hours. """
-    def __init__(self):
-        try:
-            self.connection = pymysql.connect(
-                host=cfg.mysql["host"],
-                user=cfg.mysql["user"],
-                password=cfg.mysql["password"],
-                database=cfg.mysql["database"],
-                port=cfg.mysql.get("port", 3306),
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            print("Connected to MySQL in OpeningHoursDAO with PyMySQL!")
-        except MySQLError as err:
-            print("Error connecting to MySQL in CarParksDAO:", err)
-            raise
+    def __init__(self, pool=None):
+        # Connections are checked out of the shared pool per query, so one
+        # DAO instance can safely be used from every Flask worker thread.
+        self.pool = pool or get_pool()
 
     def execute_query(self, sql, params=None, fetch=False, fetch_one=False):
         """Executes a SQL query and returns the result."""
-        if not self.connection or not self.connection.open:
-            logging.error("No active database connection.")
-            return None
-
         try:
-            with self.connection.cursor() as cursor:
+            with self.pool.connection() as connection, connection.cursor() as cursor:
                 cursor.execute(sql, params or ())
+                self.pool.count_query()
                 result = cursor.fetchone() if fetch_one else (cursor.fetchall() if fetch else None)
-                self.connection.commit()
+                connection.commit()
                 return result if fetch or fetch_one else True
         except MySQLError as err:
             logging.error("Query execution failed: %s", err)
             return False if not fetch else None
 
-    def close_connection(self):
-        """Closes the database connection."""
-        try:
-            if self.connection and self.connection.open:
-                self.connection.close()
-                print("Database connection closed.")
-        except MySQLError as err:
-            logging.error("Error closing connection: %s", err)
-
     def get_all_opening_hours(self):
         """Retrieves opening hours for all car parks."""
         sql = "SELECT * FROM openinghours"
@@ -58,16 +98,31 @@ class OpeningHoursDAO:
 
     def add_opening_hours(self, car_park_id, day_of_week, opening_time, closing_time, status="active"):
         """Adds new opening hours for a car park."""
-        sql = """
-            INSERT INTO openinghours (car_park_id, day_of_week, opening_time, closing_time, status)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        return self.execute_query(sql, (car_park_id, day_of_week, opening_time, closing_time, status))
+        result = self.execute_query(INSERT_OPENING_HOURS_SQL,
+                                    (car_park_id, day_of_week, opening_time, closing_time, status))
+        read_cache.invalidate_car_park(car_park_id)
+        return result
 
     def get_opening_hours_for_car_park(self, car_park_id):
         """Retrieves opening hours for a specific car park."""
         sql = "SELECT * FROM openinghours WHERE car_park_id = %s"
-        return self.execute_query(sql, (car_park_id,), fetch=True)
+        return read_cache.get_or_load(("opening_hours", str(car_park_id)),
+                                      lambda: self.execute_query(sql, (car_park_id,), fetch=True))
+
+    def get_week_status(self, car_park_id):
+        """
+        Returns the precomputed opening hours response for each day of the week
+        (an empty dict if the car park has no opening hours).
+        """
+        def load():
+            opening_hours = self.get_opening_hours_for_car_park(car_park_id)
+            return None if opening_hours is None else build_week_status(opening_hours)
+        return read_cache.get_or_load(("week_status", str(car_park_id)), load)
+
+    def prime_cache(self, car_park_id, opening_hours):
+        """Stores already-fetched opening hours (and their week status) in the read cache."""
+        read_cache.set(("opening_hours", str(car_park_id)), opening_hours)
+        read_cache.set(("week_status", str(car_park_id)), build_week_status(opening_hours))
 
     def update_opening_hours(self, car_park_id, day_of_week, opening_time, closing_time, status):
         """Updates opening hours for a specific entry."""
@@ -76,17 +131,13 @@ class OpeningHoursDAO:
             SET day_of_week = %s, opening_time = %s, closing_time = %s, status = %s
             WHERE id = %s
         """
-        return self.execute_query(sql, (day_of_week, opening_time, closing_time, status,car_park_id))
+        result = self.execute_query(sql, (day_of_week, opening_time, closing_time, status,car_park_id))
+        read_cache.clear()  # Only the row ID is known here, so drop everything
+        return result
 
     def delete_opening_hours(self, car_park_id):
         """Deletes an opening hours entry by ID."""
         sql = "DELETE FROM openinghours WHERE id = %s"
-        return self.execute_query(sql, (car_park_id))
-
-    def __del__(self):
-        try:
-            if self.connection and self.connection.open:
-                self.connection.close()
-        except MySQLError as err:
-            logging.error("Error during cleanup: %s", err)  
-    
\ No newline at end of file
+        result = self.execute_query(sql, (car_park_id))
+        read_cache.clear()  # Only the row ID is known here, so drop everything
+        return result
@@ -0,0 +1,121 @@
+# WSAA-project: Web Services and Applications.
+# In-process LRU read cache (with per-entry TTL) shared by the DAOs.
+# Author: Laura Lyons
+
+import threading
+import time
+from collections import OrderedDict
+
+import dbconfig as cfg
+
+
+class ReadCache:
+    """
+    Bounded LRU cache whose entries expire after `ttl` seconds.
+
+    Keys are tuples such as ("opening_hours", "3"); every key for one car park
+    ends with its ID as a string so invalidate_car_park can drop them all.
+    Cached values are shared between requests and must not be mutated.
+
+    Each car park has a generation number, bumped by invalidate_car_park (clear
+    bumps them all). A load that started before a write only gets stored
+    if the generation is unchanged, so a slow read cannot re-cache stale rows.
+    """
+    def __init__(self, max_size=256, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = {}
+        self._clear_generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0,
+                       "stale_loads": 0}
+
+    def generation(self, key):
+        """ Current generation for the car park a key belongs to. """
+        with self._lock:
+            return self._generation(key)
+
+    def _generation(self, key):
+        return (self._clear_generation, self._generations.get(key[-1], 0))
+
+    def get(self, key):
+        """ Returns the cached value, or None if it is missing or expired. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None, generation=None):
+        """
+        Stores a value, evicting the least recently used entry when full.
+
+        If `generation` (from generation()) is given and the car park has been
+        invalidated since, the value is stale and is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation(key):
+                self._stats["stale_loads"] += 1
+                return
+            self._entries[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value or calls `loader()` and caches its result.
+
+        None and False (not found / query failed) are returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self.generation(key)
+        value = loader()
+        if value is not None and value is not False:
+            self.set(key, value, generation=generation)
+        return value
+
+    def invalidate_car_park(self, car_park_id):
+        """ Drops every cached entry belonging to one car park. """
+        car_park_id = str(car_park_id)
+        with self._lock:
+            stale = [key for key in self._entries if key[-1] == car_park_id]
+            for key in stale:
+                del self._entries[key]
+            self._generations[car_park_id] = self._generations.get(car_park_id, 0) + 1
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        """ Empties the cache. """
+        with self._lock:
+            self._entries.clear()
+            self._clear_generation += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        """ Returns hit/miss/eviction counters and the current size. """
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl})
+        return stats
+
+
+# Shared cache instance used by both DAOs
+read_cache = ReadCache(
+    max_size=cfg.mysql.get("cache_size", 256),
+    ttl=cfg.mysql.get("cache_ttl", 300)
+)
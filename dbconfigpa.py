@@ -7,5 +7,10 @@ mysql = {
     'user':"lauralyons1982",
     'password':"mysqlpassword6826",
     'database':"lauralyons1982$CarParks",
-    "port": 3306
+    "port": 3306,
+    "pool_size": 5,                    # Maximum open connections shared by the DAOs
+    "pool_timeout": 10,                # Seconds a request waits for a free connection
+    "pool_health_check_interval": 30,  # Ping connections idle for longer than this
+    "cache_size": 256,                 # Maximum entries in the DAO read cache
+    "cache_ttl": 300                   # Seconds before a cached read is reloaded
 }
\ No newline at end of file
@@ -0,0 +1,24 @@
+# WSAA-project: Web Services and Applications.
+# Configuration file for the Cork City Council live parking feed.
+# Author: Laura Lyons
+
+import os
+
+live_feed = {
+    # LIVE_FEED_API_URL points the app at another endpoint (e.g. benchmarks/fake_council_api.py)
+    'api_url': os.environ.get("LIVE_FEED_API_URL",
+                              "https://data.corkcity.ie/en_GB/api/3/action/datastore_search_sql"),
+    'resource_id': "f4677dac-bb30-412e-95a8-d3c22134e3c0",
+    'timeout': 10,            # Seconds to wait for the council API
+    'refresh_interval': 30,   # Seconds between background polls
+    'ttl': 120                # Seconds a snapshot is considered fresh
+}
+
+occupancy_history = {
+    'enabled': True,
+    'sample_interval': 60,         # Seconds between recorded samples
+    'flush_interval': 60,          # Seconds between batched inserts
+    'rollup_interval': 3600,       # Seconds between downsampling runs
+    'raw_retention_days': 7,       # Raw samples older than this are rolled up hourly
+    'hourly_retention_days': 730   # Hourly roll-ups older than this are deleted
+}
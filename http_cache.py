@@ -0,0 +1,227 @@
+# WSAA-project: Web Services and Applications.
+# HTTP caching for the API: ETags, Cache-Control, compression and static asset fingerprints.
+# Author: Laura Lyons
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli  # Optional: Brotli is used when installed, otherwise gzip
+except ImportError:
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# JSON smaller than this is sent uncompressed (headers would outweigh the saving)
+MIN_COMPRESS_SIZE = 512
+
+# Cache-Control per endpoint. Browsers revalidate live data every time (a cheap
+# 304 when nothing changed) while a shared cache/CDN may hold it briefly.
+CACHE_POLICIES = {
+    "get_car_parks": "public, max-age=0, s-maxage=10, stale-while-revalidate=30",
+    "get_car_park_availability": "public, max-age=0, s-maxage=10, stale-while-revalidate=30",
+    "get_opening_hours": "public, max-age=0, s-maxage=60",
+    "get_height_restriction": "public, max-age=0, s-maxage=60",
+    "get_car_park": "public, max-age=0, s-maxage=60",
+    "get_occupancy_history": "public, max-age=60",
+    "index": "no-cache",
+}
+DEFAULT_POLICY = "no-store"
+STATIC_POLICY = "no-cache"
+FINGERPRINTED_STATIC_POLICY = "public, max-age=31536000, immutable"
+
+
+def body_etag(body):
+    """ Strong ETag for a response body. """
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def http_date(timestamp):
+    """ Formats a Unix timestamp for Last-Modified. """
+    return formatdate(timestamp, usegmt=True)
+
+
+def etag_matches(if_none_match, etag):
+    """ True if the If-None-Match header names this ETag (or is "*"). """
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified_since(if_modified_since, last_modified):
+    """ True if Last-Modified is not newer than If-Modified-Since. """
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def negotiate_encoding(accept_encoding):
+    """ Picks "br" or "gzip" from the Accept-Encoding header (None for identity). """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressedBodyCache:
+    """ Small LRU of compressed bodies keyed by (ETag, encoding), so unchanged data is compressed once. """
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, body, encoding, etag):
+        key = (etag, encoding)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=5)
+        else:
+            compressed = gzip.compress(body, compresslevel=6)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compressed
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+def prepare_json_response(method, request_headers, status, body, headers):
+    """
+    Applies conditional requests and compression to a JSON response.
+
+    `headers` is the response's header mapping and is updated in place.
+    Returns the (status, body) to send: 304 with an empty body if the client
+    already has this version, otherwise the (possibly compressed) body.
+    """
+    if method not in ("GET", "HEAD") or status != 200:
+        return status, body
+
+    etag = headers.get("ETag") or body_etag(body)
+    encoding = None
+    if len(body) >= MIN_COMPRESS_SIZE and "Content-Encoding" not in headers:
+        encoding = negotiate_encoding(request_headers.get("Accept-Encoding"))
+
+    # Each encoding is a different representation, so it gets its own strong ETag
+    if encoding:
+        etag = etag[:-1] + "-" + encoding + '"'
+    headers["ETag"] = etag
+    headers["Vary"] = "Accept-Encoding"
+
+    if_none_match = request_headers.get("If-None-Match")
+    if etag_matches(if_none_match, etag) or \
+       (not if_none_match and not_modified_since(request_headers.get("If-Modified-Since"),
+                                                 headers.get("Last-Modified"))):
+        return 304, b""
+
+    if encoding:
+        body = compressed_bodies.get(body, encoding, etag)
+        headers["Content-Encoding"] = encoding
+    return status, body
+
+
+def cache_control_for(endpoint, args):
+    """ Cache-Control header value for a request. """
+    if endpoint == "static":
+        return FINGERPRINTED_STATIC_POLICY if "v" in args else STATIC_POLICY
+    return CACHE_POLICIES.get(endpoint, DEFAULT_POLICY)
+
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def asset_fingerprint(filename):
+    """ Short content hash of a file in static/, recomputed only when the file changes. """
+    path = os.path.join(STATIC_FOLDER, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _fingerprints_lock:
+        cached = _fingerprints.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, "rb") as f:
+        fingerprint = hashlib.md5(f.read()).hexdigest()[:12]
+    with _fingerprints_lock:
+        _fingerprints[filename] = (mtime, fingerprint)
+    return fingerprint
+
+
+def _asset_url_helper(url_for):
+    def asset_url(filename):
+        """ URL for a static file with its content hash, so it can be cached forever. """
+        return url_for("static", filename=filename, v=asset_fingerprint(filename))
+    return asset_url
+
+
+def _set_cache_control(request, response):
+    policy = cache_control_for(request.endpoint, request.args)
+    if request.endpoint == "static":
+        response.headers["Cache-Control"] = policy  # Replaces the framework's default
+    else:
+        response.headers.setdefault("Cache-Control", policy)
+
+
+def init_app(app):
+    """ Registers the caching hooks and the asset_url() template helper on a Flask app. """
+    from flask import request, url_for
+
+    app.jinja_env.globals["asset_url"] = _asset_url_helper(url_for)
+
+    @app.after_request
+    def apply_http_caching(response):
+        _set_cache_control(request, response)
+        if response.is_streamed or response.direct_passthrough or response.mimetype != "application/json":
+            return response
+
+        status, body = prepare_json_response(request.method, request.headers, response.status_code,
+                                             response.get_data(), response.headers)
+        response.status_code = status
+        response.set_data(body)
+        return response
+
+
+def init_async_app(app):
+    """ Same as init_app() for the Quart (ASGI) app. """
+    from quart import request, url_for
+
+    app.jinja_env.globals["asset_url"] = _asset_url_helper(url_for)
+
+    @app.after_request
+    async def apply_http_caching(response):
+        _set_cache_control(request, response)
+        if not isinstance(response.response, response.data_body_class) or \
+           response.mimetype != "application/json":
+            return response
+
+        status, body = prepare_json_response(request.method, request.headers, response.status_code,
+                                             await response.get_data(), response.headers)
+        response.status_code = status
+        response.set_data(body)
+        return response
@@ -0,0 +1,236 @@
+# WSAA-project: Web Services and Applications.
+# Background-refreshed cache for the Cork City Council live parking feed.
+# Author: Laura Lyons
+
+import logging
+import threading
+import time
+
+import requests
+
+import feedconfig as cfg
+
+logging.basicConfig(level=logging.ERROR)
+
+
+def live_feed_params():
+    """ Query string for the council datastore_search_sql endpoint. """
+    return {"sql": f'SELECT * FROM "{cfg.live_feed["resource_id"]}"'}
+
+
+def parse_live_records(data):
+    """
+    Extracts the car park records from a datastore_search_sql response.
+
+    Raises ValueError if the body is not shaped like one (e.g. "result" is
+    null), so the poll counts as failed and the previous snapshot is kept.
+    """
+    result = data.get("result") if isinstance(data, dict) else None
+    live_data = result.get("records") if isinstance(result, dict) else None
+    if not isinstance(live_data, list):
+        raise ValueError("Unexpected response from the live feed: no result records")
+
+    live_data = [item for item in live_data if isinstance(item, dict)]
+    for item in live_data:
+        item["id"] = item.get("_id", None)  # Fix ID reference
+
+    return live_data
+
+
+def fetch_live_records(timeout=None):
+    """ Fetch the live parking records from the council API (raises on failure). """
+    response = requests.get(cfg.live_feed["api_url"], params=live_feed_params(),
+                            timeout=timeout or cfg.live_feed.get("timeout", 10))
+    response.raise_for_status()
+    return parse_live_records(response.json())
+
+
+class LiveFeedCache:
+    """
+    Keeps the latest snapshot of the live feed in memory.
+
+    A single background thread polls the council API every refresh_interval
+    seconds. Request handlers only ever read the stored snapshot: a failed
+    poll keeps serving the previous (stale) snapshot, and concurrent refreshes
+    are coalesced so only one upstream call is in flight at a time.
+    """
+    def __init__(self, fetcher=fetch_live_records, refresh_interval=None, ttl=None):
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval or cfg.live_feed.get("refresh_interval", 30)
+        self.ttl = ttl or cfg.live_feed.get("ttl", 120)
+
+        self._records = None
+        self._index = {}
+        self._version = 0
+        self._fetched_at = None
+        self._cond = threading.Condition()
+        self._refreshing = False
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        # Set when an event loop polls upstream and calls store(); the cache
+        # then never fetches or blocks on behalf of a request.
+        self.external_refresh = False
+        self._listeners = []
+
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0,
+                       "coalesced": 0, "errors": 0, "last_error": None}
+
+    def start(self):
+        """ Starts the background refresher (only once). """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="live-feed-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the background refresher. """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.refresh()
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+
+    def refresh(self):
+        """
+        Fetches a new snapshot from upstream and returns the current records.
+
+        If a refresh is already running the caller waits for it instead of
+        issuing a second upstream request. On failure the old snapshot is kept.
+        """
+        with self._cond:
+            if self._refreshing:
+                self._stats["coalesced"] += 1
+                while self._refreshing:
+                    self._cond.wait()
+                return self._records or []
+            self._refreshing = True
+
+        records = None
+        try:
+            records = self.fetcher()
+        except Exception as e:  # Any failed poll keeps the previous snapshot
+            self.record_error(e)
+        finally:
+            # Always release waiters, or a failed refresh would block them forever
+            with self._cond:
+                if records is not None:
+                    self._store(records)
+                self._refreshing = False
+                self._cond.notify_all()
+                current = self._records or []
+
+        if records is not None:
+            self._notify(records)
+        return current
+
+    def store(self, records):
+        """ Installs a snapshot fetched elsewhere (e.g. by the async refresher). """
+        with self._cond:
+            self._store(records)
+            self._cond.notify_all()
+        self._notify(records)
+
+    def add_listener(self, callback):
+        """
+        Registers callback(records) to run after every successful refresh.
+
+        Callbacks run on the refreshing thread, so they should only queue work.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, records):
+        for callback in self._listeners:
+            try:
+                callback(records)
+            except Exception:  # A broken listener must not stop the refresher
+                logging.exception("Live feed listener failed")
+
+    def _store(self, records):
+        if records != self._records:
+            # Index by id once per refresh so lookups are O(1)
+            self._index = {str(item.get("id")): item for item in records}
+            self._version += 1
+        self._records = records
+        self._fetched_at = time.monotonic()
+        self._stats["refreshes"] += 1
+
+    def record_error(self, error):
+        """ Counts a failed poll; the previous snapshot keeps being served. """
+        logging.error("Error fetching live spaces: %s", error)
+        with self._cond:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = str(error)
+
+    def get_records(self, wait=None):
+        """
+        Returns the latest live records without touching the network.
+
+        Before the first snapshot arrives the caller waits (up to `wait`
+        seconds) for the in-flight refresh rather than starting its own.
+        """
+        refresher_running = self.external_refresh or (self._thread is not None and self._thread.is_alive())
+
+        with self._cond:
+            if self._records is not None:
+                if self.snapshot_age() <= self.ttl:
+                    self._stats["hits"] += 1
+                    return self._records
+                self._stats["stale_hits"] += 1
+                if refresher_running:
+                    self._wakeup.set()  # Ask the refresher to poll early
+                    return self._records
+            else:
+                self._stats["misses"] += 1
+
+        if not refresher_running:
+            return self.refresh()
+        if self.external_refresh:
+            return self._records or []
+
+        self._wakeup.set()
+        deadline = time.monotonic() + (wait if wait is not None else cfg.live_feed.get("timeout", 10))
+        with self._cond:
+            while self._records is None and not self._stopped.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._records or []
+
+    def get_index(self, wait=None):
+        """ Returns the latest records keyed by str(car park id). """
+        self.get_records(wait)
+        return self._index
+
+    @property
+    def version(self):
+        """ Increases every time a refresh brings back different records. """
+        return self._version
+
+    def snapshot_age(self):
+        """ Seconds since the current snapshot was fetched (None if there is none). """
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def stats(self):
+        """ Returns the cache counters together with the snapshot age. """
+        with self._cond:
+            stats = dict(self._stats)
+            age = self.snapshot_age()
+            stats["snapshot_age"] = round(age, 3) if age is not None else None
+            stats["records"] = len(self._records) if self._records is not None else 0
+            stats["stale"] = age is None or age > self.ttl
+            stats["version"] = self._version
+        return stats
+
+
+# Shared cache instance used by the Flask app
+live_feed = LiveFeedCache()
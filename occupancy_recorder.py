@@ -0,0 +1,129 @@
+# WSAA-project: Web Services and Applications.
+# Records the live free-space figures into the occupancy history tables.
+# Author: Laura Lyons
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import feedconfig as cfg
+
+logging.basicConfig(level=logging.ERROR)
+
+
+def utc_now():
+    """ Current UTC time as a naive datetime (the history tables store UTC). """
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def parse_free_spaces(value):
+    """ Returns the free spaces as an int, or None for values such as "Closed". """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class OccupancyRecorder:
+    """
+    Samples the live feed and appends the results to the history tables.
+
+    The recorder listens to the LiveFeedCache, so it costs no extra upstream
+    calls. Samples are buffered in memory and written by a background thread
+    with one batched insert every flush_interval seconds; old samples are
+    periodically rolled up into hourly rows and pruned.
+    """
+    def __init__(self, history_dao, feed, sample_interval=None, flush_interval=None,
+                 rollup_interval=None, raw_retention_days=None, hourly_retention_days=None,
+                 max_buffer=10000):
+        settings = cfg.occupancy_history
+        self.history_dao = history_dao
+        self.feed = feed
+        self.sample_interval = sample_interval or settings.get("sample_interval", 60)
+        self.flush_interval = flush_interval or settings.get("flush_interval", 60)
+        self.rollup_interval = rollup_interval or settings.get("rollup_interval", 3600)
+        self.raw_retention = timedelta(days=raw_retention_days or settings.get("raw_retention_days", 7))
+        self.hourly_retention = timedelta(days=hourly_retention_days or settings.get("hourly_retention_days", 730))
+        self.max_buffer = max_buffer
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_sample = 0
+        self._last_rollup = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._stats = {"samples": 0, "flushes": 0, "flush_errors": 0, "rollups": 0}
+
+    def start(self):
+        """ Creates the tables, subscribes to the feed and starts the writer thread. """
+        if self._thread and self._thread.is_alive():
+            return
+        if not self.history_dao.ensure_schema():
+            logging.error("Occupancy history disabled: tables could not be created.")
+            return
+        self.feed.add_listener(self.sample)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="occupancy-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Flushes what is buffered and stops the writer thread. """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def sample(self, records):
+        """ Feed listener: buffers one row per car park (at most once per sample_interval). """
+        now = time.monotonic()
+        if now - self._last_sample < self.sample_interval:
+            return
+        self._last_sample = now
+
+        recorded_at = utc_now()
+        rows = []
+        for item in records:
+            free_spaces = parse_free_spaces(item.get("free_spaces"))
+            if item.get("id") is not None and free_spaces is not None:
+                rows.append((item["id"], recorded_at, free_spaces))
+
+        with self._lock:
+            self._buffer.extend(rows)
+            self._stats["samples"] += len(rows)
+
+    def flush(self):
+        """
+        Writes the buffered samples in one batch. If the write fails they are
+        kept for the next flush (oldest dropped beyond max_buffer rows).
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        if self.history_dao.add_samples(rows):
+            self._stats["flushes"] += 1
+        else:
+            self._stats["flush_errors"] += 1
+            with self._lock:
+                self._buffer = (rows + self._buffer)[-self.max_buffer:]
+
+    def rollup(self):
+        """ Downsamples raw rows past the raw retention period and prunes old roll-ups. """
+        now = utc_now()
+        if self.history_dao.rollup_and_prune(now - self.raw_retention, now - self.hourly_retention):
+            self._stats["rollups"] += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                self._last_rollup = time.monotonic()
+                self.rollup()
+
+    def stats(self):
+        """ Returns sample/flush counters and the number of buffered rows. """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["buffered"] = len(self._buffer)
+        return stats
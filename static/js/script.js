@@ -27,6 +27,7 @@ window.showForm = function(formId) {
 document.addEventListener("DOMContentLoaded", async function () {
     // Fetch initial car parks for dropdowns
     await fetchCarParks(); 
+    connectAvailabilityStream();
     updateCurrentTime();
     setInterval(updateCurrentTime, 1000);
 
@@ -63,33 +64,103 @@ document.addEventListener("DOMContentLoaded", async function () {
             return;
         }
 
+        // Use the free spaces pushed by the server when the stream is live
+        if (liveStreamReady) {
+            renderFreeSpaces(liveSpaces[selectedId] ?? "No live data available");
+            return;
+        }
+
         try {
             const response = await fetch(`/api/car-parks/${selectedId}`);  
             if (!response.ok) throw new Error(`Server Error: ${response.status} ${response.statusText}`);
 
             const carPark = await response.json();
-            console.log("🔍 Live free spaces:", carPark.free_spaces);
-
-            resultContainer.classList.remove("d-none");
-            resultContainer.className = "alert mt-3";
-
-            if (carPark.free_spaces === "Closed") {
-                resultContainer.innerText = "This car park is closed.";
-                resultContainer.classList.add("alert-warning");
-            } else if (parseInt(carPark.free_spaces) > 0) {
-                resultContainer.innerText = `Yes, ${carPark.free_spaces} free spaces available.`;
-                resultContainer.classList.add("alert-success");
-            } else {
-                resultContainer.innerText = "There is no verified data on space availability for this car park.";
-                resultContainer.classList.add("alert-danger");
-            }
+            renderFreeSpaces(carPark.free_spaces);
         } catch (error) {
             console.error("Error fetching availability:", error);
+            resultContainer.classList.remove("d-none");
             resultContainer.innerText = "No live data available.";
         }
     }
 );
 
+// Live availability pushed by the server (only changed car parks are sent)
+const liveSpaces = {};
+let liveStreamReady = false;
+let liveStreamHasSnapshot = false;
+
+// Function to show the free spaces for the selected car park
+function renderFreeSpaces(freeSpaces) {
+    const resultContainer = document.getElementById("checkFreeSpaces");
+    console.log("🔍 Live free spaces:", freeSpaces);
+
+    resultContainer.classList.remove("d-none");
+    resultContainer.className = "alert mt-3";
+
+    if (freeSpaces === null || freeSpaces === undefined) {
+        resultContainer.innerText = "No live data available.";
+        resultContainer.classList.add("alert-danger");
+    } else if (freeSpaces === "Closed") {
+        resultContainer.innerText = "This car park is closed.";
+        resultContainer.classList.add("alert-warning");
+    } else if (parseInt(freeSpaces) > 0) {
+        resultContainer.innerText = `Yes, ${freeSpaces} free spaces available.`;
+        resultContainer.classList.add("alert-success");
+    } else {
+        resultContainer.innerText = "There is no verified data on space availability for this car park.";
+        resultContainer.classList.add("alert-danger");
+    }
+}
+
+// Function to update the result if the selected car park is on display
+function refreshSelectedAvailability(changedIds) {
+    const selectedId = document.getElementById("carParkDropdown").value;
+    const resultContainer = document.getElementById("checkFreeSpaces");
+
+    if (!selectedId || resultContainer.classList.contains("d-none")) return;
+    if (changedIds && !changedIds.includes(selectedId)) return;
+
+    renderFreeSpaces(liveSpaces[selectedId] ?? "No live data available");
+}
+
+// Function to subscribe to the server-sent availability stream.
+// EventSource reconnects by itself and sends Last-Event-ID, so the server
+// only replays the changes that were missed while disconnected.
+function connectAvailabilityStream() {
+    if (!window.EventSource) return; // Fall back to fetching on each selection
+
+    const source = new EventSource("/api/car-parks/stream");
+
+    source.addEventListener("open", function () {
+        liveStreamReady = liveStreamHasSnapshot;
+    });
+
+    source.addEventListener("error", function () {
+        liveStreamReady = false;
+    });
+
+    source.addEventListener("snapshot", function (event) {
+        Object.keys(liveSpaces).forEach(id => delete liveSpaces[id]);
+        Object.assign(liveSpaces, JSON.parse(event.data));
+        liveStreamHasSnapshot = true;
+        liveStreamReady = true;
+        refreshSelectedAvailability();
+    });
+
+    source.addEventListener("availability", function (event) {
+        const changes = JSON.parse(event.data);
+        Object.entries(changes).forEach(([id, freeSpaces]) => {
+            // null means the car park is no longer in the live feed
+            if (freeSpaces === null) {
+                delete liveSpaces[id];
+            } else {
+                liveSpaces[id] = freeSpaces;
+            }
+        });
+        refreshSelectedAvailability(Object.keys(changes));
+    });
+}
+
 // Opening Hours
 document.addEventListener("DOMContentLoaded", function () {
     const showOpeningHoursBtn = document.getElementById("toggleOpeningHoursBtn");